@@ -1,22 +1,30 @@
 import random
 
-from gtts import gTTS
+from gtts import gTTS, gTTSError
 
 from utils import settings
+from utils.rate_limit import RateLimitError
 
 
 class GTTS:
     def __init__(self):
         self.max_chars = 5000
+        self.max_workers = 4
+        self.requests_per_second = 4
         self.voices = []
 
-    def run(self, text, filepath):
+    def run(self, text, filepath, random_voice: bool = False):
         tts = gTTS(
             text=text,
             lang=settings.config["reddit"]["thread"]["post_lang"] or "en",
             slow=False,
         )
-        tts.save(filepath)
+        try:
+            tts.save(filepath)
+        except gTTSError as error:
+            if error.rsp is not None and error.rsp.status_code == 429:
+                raise RateLimitError.from_headers(error.rsp.headers, str(error)) from error
+            raise
 
     def randomvoice(self):
         return random.choice(self.voices)
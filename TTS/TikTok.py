@@ -1,14 +1,18 @@
 # documentation for tiktok api: https://github.com/oscie57/tiktok-voice/wiki
+import asyncio
 import base64
 import random
+import threading
 import time
-from typing import Final, Optional
+from typing import Dict, Final, Iterable, List, Optional, Tuple
 
-import requests
+import aiohttp
 
-from utils import settings
+from utils import http_client, settings
+from utils.console import print_substep
+from utils.rate_limit import RateLimitError
 
-__all__ = ["TikTok", "TikTokTTSException"]
+__all__ = ["TikTok", "TikTokTTSException", "SessionPool"]
 
 disney_voices: Final[tuple] = (
     "en_us_ghostface",  # Ghost Face
@@ -76,37 +80,165 @@ vocals: Final[tuple] = (
 )
 
 
+# status codes of a request that would fail with any session (wrong aid, text too long, bad speaker),
+# see TikTokTTSException. TikTok throttles an account with an HTTP 200 and another status code, so
+# every other code benches the session
+REQUEST_ERRORS: Final[tuple] = (1, 2, 4)
+INVALID_SESSION: Final[int] = 5  # the session id doesn't exist or expired
+BENCH_BASE = 15  # seconds a throttled session sits out, doubled every time in a row it's throttled
+BENCH_CAP = 300
+
+
+class SessionPool:
+    """The TikTok session ids of settings.tts.tiktok_sessionid, used in turn.
+
+    Every account has its own quota, so the requests are spread over the ones which aren't benched.
+    A session is benched for a while when TikTok throttles it (a 429, or a status code in the
+    response which isn't an error of the request), and dropped for the run when its id is invalid.
+
+    Args:
+        session_ids (Iterable[str]): The session ids.
+    """
+
+    def __init__(self, session_ids: Iterable[str]):
+        self.session_ids: List[str] = list(dict.fromkeys(session_ids))
+        self.benched_until: Dict[str, float] = dict.fromkeys(self.session_ids, 0.0)  # time.time()
+        self.strikes: Dict[str, int] = dict.fromkeys(self.session_ids, 0)
+        self.next = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Optional[str]:
+        """The next session id which isn't benched nor in exclude, None if there isn't one."""
+        with self.lock:
+            now = time.time()
+            for offset in range(len(self.session_ids)):
+                index = (self.next + offset) % len(self.session_ids)
+                session_id = self.session_ids[index]
+                if session_id not in exclude and self.benched_until[session_id] <= now:
+                    self.next = index + 1
+                    return session_id
+            return None
+
+    def succeeded(self, session_id: str) -> None:
+        with self.lock:
+            self.strikes[session_id] = 0
+
+    def bench(self, session_id: str, until: Optional[float] = None) -> None:
+        """Rests the session until the unix time until, or for longer every time in a row."""
+        with self.lock:
+            self.strikes[session_id] += 1
+            if until is None:
+                until = time.time() + min(
+                    BENCH_CAP, BENCH_BASE * 2 ** (self.strikes[session_id] - 1)
+                )
+            self.benched_until[session_id] = max(self.benched_until[session_id], until)
+
+    def drop(self, session_id: str) -> bool:
+        """Stops using the session, False if it was already dropped."""
+        with self.lock:
+            if session_id not in self.session_ids:
+                return False
+            self.session_ids.remove(session_id)
+            return True
+
+    def available_at(self) -> float:
+        """The unix time the first benched session can be used again."""
+        with self.lock:
+            return min(
+                (self.benched_until[session_id] for session_id in self.session_ids),
+                default=time.time(),
+            )
+
+    def __len__(self) -> int:
+        return len(self.session_ids)
+
+
+_pools: Dict[Tuple[str, ...], SessionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def session_pool(session_ids: Iterable[str]) -> SessionPool:
+    """The pool of the session ids, shared by every TTSEngine of the process."""
+    key = tuple(session_ids)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SessionPool(key)
+        return _pools[key]
+
+
 class TikTok:
-    """TikTok Text-to-Speech Wrapper"""
+    """TikTok Text-to-Speech Wrapper
+
+    The requests are made on the shared HTTP event loop (utils/http_client.py), over keep-alive
+    connections with connect and read timeouts. settings.tts.tiktok_sessionid can hold several
+    comma separated session ids: the requests go to them in turn, each with its own cookies, and a
+    throttled session is benched while the others carry on (see SessionPool).
+    """
 
     def __init__(self):
-        headers = {
+        self.headers = {
             "User-Agent": "com.zhiliaoapp.musically/2022600030 (Linux; U; Android 7.1.2; es_ES; SM-G988N; "
             "Build/NRD90M;tt-ok/3.12.13.1)",
-            "Cookie": f"sessionid={settings.config['settings']['tts']['tiktok_sessionid']}",
         }
+        session_ids = settings.config["settings"]["tts"]["tiktok_sessionid"]
+        if isinstance(session_ids, str):
+            session_ids = session_ids.split(",")
+        self.sessions = session_pool(
+            session_id.strip() for session_id in session_ids if session_id.strip()
+        )
 
         self.URI_BASE = "https://api16-normal-c-useast1a.tiktokv.com/media/api/text/speech/invoke/"
         self.max_chars = 200
-
-        self._session = requests.Session()
-        # set the headers to the session, so we don't have to do it for every request
-        self._session.headers = headers
+        # the quota is per account, so is the throughput
+        self.max_workers = min(16, 4 * max(1, len(self.sessions)))
+        self.requests_per_second = 4 * max(1, len(self.sessions))
+        self.retryable = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
 
     def run(self, text: str, filepath: str, random_voice: bool = False):
+        http_client.run(self.arun(text, filepath, random_voice))
+
+    async def arun(self, text: str, filepath: str, random_voice: bool = False):
         if random_voice:
             voice = self.random_voice()
         else:
             # if tiktok_voice is not set in the config file, then use a random voice
             voice = settings.config["settings"]["tts"].get("tiktok_voice", None)
 
-        # get the audio from the TikTok API
-        data = self.get_voices(voice=voice, text=text)
+        # get the audio from the TikTok API, with the next session when one is throttled
+        tried = []
+        invalid_message = "None of the session ids is valid"
+        while True:
+            session_id = self.sessions.acquire(exclude=tried)
+            if session_id is None:
+                if not len(self.sessions):
+                    raise TikTokTTSException(INVALID_SESSION, invalid_message)
+                # utils.rate_limit waits for the first session to be back
+                raise RateLimitError(
+                    "Every TikTok session is throttled", self.sessions.available_at()
+                )
+            tried.append(session_id)
+            try:
+                data = await self.get_voices(voice=voice, text=text, session_id=session_id)
+            except RateLimitError as error:
+                self.sessions.bench(session_id, error.reset)
+                continue
 
-        # check if there was an error in the request
-        status_code = data["status_code"]
-        if status_code != 0:
-            raise TikTokTTSException(status_code, data["message"])
+            # check if there was an error in the request
+            status_code = data["status_code"]
+            if status_code == 0:
+                self.sessions.succeeded(session_id)
+                break
+            if status_code in REQUEST_ERRORS:  # another session wouldn't do better
+                raise TikTokTTSException(status_code, data["message"])
+            if status_code != INVALID_SESSION:  # throttled, the next session takes the request
+                self.sessions.bench(session_id)
+                continue
+            invalid_message = data["message"]
+            if self.sessions.drop(session_id):
+                print_substep(
+                    f"A TikTok sessionid is invalid ({invalid_message}), it isn't used anymore.",
+                    style="bold red",
+                )
 
         # decode data from base64 to binary
         try:
@@ -122,7 +254,9 @@ class TikTok:
         with open(filepath, "wb") as out:
             out.write(decoded_voices)
 
-    def get_voices(self, text: str, voice: Optional[str] = None) -> dict:
+    async def get_voices(
+        self, text: str, voice: Optional[str] = None, session_id: Optional[str] = None
+    ) -> dict:
         """If voice is not passed, the API will try to use the most fitting voice"""
         # sanitize text
         text = text.replace("+", "plus").replace("&", "and").replace("r/", "")
@@ -133,14 +267,16 @@ class TikTok:
         if voice is not None:
             params["text_speaker"] = voice
 
-        # send request
-        try:
-            response = self._session.post(self.URI_BASE, params=params)
-        except ConnectionError:
-            time.sleep(random.randrange(1, 7))
-            response = self._session.post(self.URI_BASE, params=params)
+        session_id = session_id or self.sessions.acquire()
+        headers = {**self.headers, "Cookie": f"sessionid={session_id}"}
 
-        return response.json()
+        # send request, TTSEngine tries again after a connection error
+        async with http_client.session(f"tiktok:{session_id}").post(
+            self.URI_BASE, params=params, headers=headers
+        ) as response:
+            if response.status == 429:
+                raise RateLimitError.from_headers(response.headers, "TikTok rate limit")
+            return await response.json(content_type=None)
 
     @staticmethod
     def random_voice() -> str:
@@ -162,4 +298,7 @@ class TikTokTTSException(Exception):
         if self._code == 4:
             return f"Code: {self._code}, reason: the speaker doesn't exist, message: {self._message}"
 
-        return f"Code: {self._message}, reason: unknown, message: {self._message}"
+        if self._code == 5:
+            return f"Code: {self._code}, reason: the sessionid is invalid, message: {self._message}"
+
+        return f"Code: {self._code}, reason: unknown, message: {self._message}"
@@ -1,10 +1,29 @@
 import random
-import sys
+import threading
 
 from boto3 import Session
-from botocore.exceptions import BotoCoreError, ClientError, ProfileNotFound
+from botocore.config import Config
+from botocore.exceptions import (
+    BotoCoreError,
+    ClientError,
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ProfileNotFound,
+    ReadTimeoutError,
+)
 
 from utils import settings
+from utils.rate_limit import RateLimitError
+
+# the errors of a request which can succeed when it's made again
+TRANSIENT_ERRORS = (
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+THROTTLING_CODES = ("Throttling", "ThrottlingException", "TooManyRequestsException")
 
 voices = [
     "Brian",
@@ -26,14 +45,38 @@ voices = [
 
 
 class AWSPolly:
+    """AWS Polly Text-to-Speech Wrapper
+
+    The session and its client are made once and shared by the threads of the TTSEngine, with a
+    connection for every worker. Their retries are left to utils.rate_limit.
+    """
+
     def __init__(self):
         self.max_chars = 3000
+        self.max_workers = 16
+        self.requests_per_second = 8  # the default quota of SynthesizeSpeech
+        self.burst = 10
+        self.retryable = TRANSIENT_ERRORS
         self.voices = voices
+        self.polly = None
+        self.lock = threading.Lock()
+
+    def client(self):
+        with self.lock:  # a boto3 client is thread safe, making it isn't
+            if self.polly is None:
+                session = Session(profile_name="polly")
+                self.polly = session.client(
+                    "polly",
+                    config=Config(
+                        max_pool_connections=self.max_workers,
+                        retries={"total_max_attempts": 1},
+                    ),
+                )
+            return self.polly
 
     def run(self, text, filepath, random_voice: bool = False):
         try:
-            session = Session(profile_name="polly")
-            polly = session.client("polly")
+            polly = self.client()
             if random_voice:
                 voice = self.randomvoice()
             else:
@@ -47,23 +90,29 @@ class AWSPolly:
                 response = polly.synthesize_speech(
                     Text=text, OutputFormat="mp3", VoiceId=voice, Engine="neural"
                 )
-            except (BotoCoreError, ClientError) as error:
-                # The service returned an error, exit gracefully
-                print(error)
-                sys.exit(-1)
-
-            # Access the audio stream from the response
-            if "AudioStream" in response:
-                file = open(filepath, "wb")
-                file.write(response["AudioStream"].read())
-                file.close()
-                # print_substep(f"Saved Text {idx} to MP3 files successfully.", style="bold green")
-
-            else:
-                # The response didn't contain audio data, exit gracefully
-                print("Could not stream audio")
-                sys.exit(-1)
-        except ProfileNotFound:
+                # Access the audio stream from the response
+                if "AudioStream" not in response:
+                    # The response didn't contain audio data, the next provider can read it
+                    raise RuntimeError("AWS Polly returned no audio stream")
+                # written as it arrives instead of read in memory first
+                stream = response["AudioStream"]
+                try:
+                    with open(filepath, "wb") as file:
+                        for chunk in stream.iter_chunks(chunk_size=64 * 1024):
+                            file.write(chunk)
+                finally:
+                    stream.close()
+            except ClientError as error:
+                if error.response.get("Error", {}).get("Code") in THROTTLING_CODES:
+                    raise RateLimitError(str(error)) from error
+                # The service returned an error, raised for the fallbacks of TTSEngine
+                raise RuntimeError(f"AWS Polly failed: {error}") from error
+            except TRANSIENT_ERRORS:
+                raise  # tried again by TTSEngine
+            except BotoCoreError as error:
+                # The service returned an error, raised for the fallbacks of TTSEngine
+                raise RuntimeError(f"AWS Polly failed: {error}") from error
+        except ProfileNotFound as error:
             print("You need to install the AWS CLI and configure your profile")
             print(
                 """
@@ -71,7 +120,7 @@ class AWSPolly:
             Windows: https://docs.aws.amazon.com/polly/latest/dg/install-voice-plugin2.html
             """
             )
-            sys.exit(-1)
+            raise RuntimeError("The AWS profile polly isn't configured") from error
 
     def randomvoice(self):
         return random.choice(self.voices)
@@ -1,38 +1,110 @@
+import os
 import random
+import threading
+import time
+from typing import Dict, Optional
 
-from elevenlabs import save
+import httpx
 from elevenlabs.client import ElevenLabs
+from elevenlabs.core import ApiError
 
 from utils import settings
+from utils.rate_limit import RateLimitError
+
+VOICES_TTL = 3600  # seconds the voice catalog of the account is kept before it's fetched again
+
+# name -> voice id of the account, shared by every engine of the process
+_voices: Dict[str, str] = {}
+_voices_fetched = 0.0
+_voices_lock = threading.Lock()
+# the requests in flight to the account, shared by every engine of the process
+_slots: Optional[threading.BoundedSemaphore] = None
+_slots_lock = threading.Lock()
+
+
+def request_slots(size: int) -> threading.BoundedSemaphore:
+    """The slots of the requests to the account, the posts prepared at the same time and the
+    fallback chains share them so together they stay under the limit of the plan."""
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(size)
+        return _slots
 
 
 class elevenlabs:
+    """ElevenLabs Text-to-Speech Wrapper
+
+    The client and the voice catalog are shared by the threads of the TTSEngine. The audio is
+    written to the file as it comes, and at most settings.tts.elevenlabs_concurrency requests are
+    made at once by the whole process, the limit of the plan of the account.
+    """
+
     def __init__(self):
         self.max_chars = 2500
-        self.client: ElevenLabs = None
+        self.max_workers = int(settings.config["settings"]["tts"].get("elevenlabs_concurrency") or 2)
+        self.retryable = (httpx.TransportError,)
+        self.client: Optional[ElevenLabs] = None
+        self.lock = threading.Lock()
+        # also holds the requests of the hedges and of settings.performance.tts_workers
+        self.slots = request_slots(self.max_workers)
+        # the id of settings.tts.elevenlabs_voice_name, looked up on the first request
+        self.voice_id: Optional[str] = None
 
     def run(self, text, filepath, random_voice: bool = False):
-        if self.client is None:
-            self.initialize()
-        if random_voice:
-            voice = self.randomvoice()
-        else:
-            voice = str(settings.config["settings"]["tts"]["elevenlabs_voice_name"]).capitalize()
-
-        audio = self.client.generate(text=text, voice=voice, model="eleven_multilingual_v1")
-        save(audio=audio, filename=filepath)
-
-    def initialize(self):
-        if settings.config["settings"]["tts"]["elevenlabs_api_key"]:
-            api_key = settings.config["settings"]["tts"]["elevenlabs_api_key"]
-        else:
-            raise ValueError(
-                "You didn't set an Elevenlabs API key! Please set the config variable ELEVENLABS_API_KEY to a valid API key."
-            )
-
-        self.client = ElevenLabs(api_key=api_key)
+        client = self.initialize()
+        # given a name, generate() would fetch the whole catalog again to find its id
+        voice_id = self.voices()[self.randomvoice()] if random_voice else self.configured_voice()
+
+        temp_path = f"{filepath}.part"
+        try:
+            with self.slots:
+                # the audio is streamed, an error can also come while it's written
+                audio = client.generate(
+                    text=text, voice=voice_id, model="eleven_multilingual_v1", stream=True
+                )
+                with open(temp_path, "wb") as f:
+                    for chunk in audio:
+                        if chunk:
+                            f.write(chunk)
+            os.replace(temp_path, filepath)
+        except ApiError as error:
+            if error.status_code == 429:
+                raise RateLimitError(str(error)) from error
+            raise
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def initialize(self) -> ElevenLabs:
+        with self.lock:
+            if self.client is None:
+                if settings.config["settings"]["tts"]["elevenlabs_api_key"]:
+                    api_key = settings.config["settings"]["tts"]["elevenlabs_api_key"]
+                else:
+                    raise ValueError(
+                        "You didn't set an Elevenlabs API key! Please set the config variable ELEVENLABS_API_KEY to a valid API key."
+                    )
+
+                self.client = ElevenLabs(api_key=api_key)
+            return self.client
+
+    def configured_voice(self) -> str:
+        """The id of the voice of the settings, the catalog is only fetched the first time."""
+        if self.voice_id is None:
+            name = str(settings.config["settings"]["tts"]["elevenlabs_voice_name"]).capitalize()
+            self.voice_id = self.voices().get(name, name)
+        return self.voice_id
+
+    def voices(self) -> Dict[str, str]:
+        """The voices of the account by name, fetched at most once per VOICES_TTL."""
+        global _voices, _voices_fetched
+        client = self.initialize()
+        with _voices_lock:
+            if not _voices or time.monotonic() - _voices_fetched > VOICES_TTL:
+                _voices = {voice.name: voice.voice_id for voice in client.voices.get_all().voices}
+                _voices_fetched = time.monotonic()
+            return _voices
 
     def randomvoice(self):
-        if self.client is None:
-            self.initialize()
-        return random.choice(self.client.voices.get_all().voices).voice_name
+        return random.choice(list(self.voices()))
@@ -1,22 +1,72 @@
 import os
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from functools import partial
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
 
-import numpy as np
-import translators
-from moviepy.audio.AudioClip import AudioClip
-from moviepy.audio.fx.volumex import volumex
-from moviepy.editor import AudioFileClip
-from rich.progress import track
+import ffmpeg
 
-from utils import settings
-from utils.console import print_step, print_substep
-from utils.voice import sanitize_text
+from utils import metrics, profiling, rate_limit, settings
+from utils.audio_duration import audio_duration, save_durations
+from utils.console import print_step, print_substep, track
+from utils.latency import latency_histograms
+from utils.pipeline import check_stop
+from utils.speech_rate import speech_rates
+from utils.translation import prefetch, translate
+from utils.tts_cache import VOICE_SETTINGS, tts_cache
+from utils.voice import chunk_text, sanitize_text
 
 DEFAULT_MAX_LENGTH: int = (
     50  # Video length variable, edit this on your own risk. It should work, but it's not supported
 )
+# seconds between the checks of a hedged request waiting for the slot of its provider
+SLOT_POLL = 0.05
+
+
+class Hedge:
+    """The requests made to the providers of the chain for the same text.
+
+    A request holds a slot of its provider while it runs. Once one of them read the text, the others
+    give their slot back at once, even if their call is still running, and the ones waiting for a
+    slot or a retry give up.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.settled = False
+        # the slots held by the requests, by their index in the chain
+        self.held: Dict[int, threading.BoundedSemaphore] = {}
+
+    def acquire(self, index: int, slot: threading.BoundedSemaphore) -> bool:
+        """Waits for a slot for the request, False once the text was read by another provider."""
+        while not slot.acquire(timeout=SLOT_POLL):
+            if self.settled:
+                return False
+        with self.lock:
+            if self.settled:
+                slot.release()
+                return False
+            self.held[index] = slot
+        return True
+
+    def release(self, index: int) -> None:
+        with self.lock:
+            slot = self.held.pop(index, None)
+        if slot is not None:
+            slot.release()
+
+    def settle(self) -> None:
+        """Gives back the slots of every request, the text doesn't need them anymore."""
+        with self.lock:
+            self.settled = True
+            held, self.held = self.held, {}
+        for slot in held.values():
+            slot.release()
 
 
 class TTSEngine:
@@ -27,9 +77,14 @@ class TTSEngine:
         reddit_object         : The reddit object that contains the posts to read.
         path (Optional)       : The unix style path to save the mp3 files to. This must not have leading or trailing slashes.
         max_length (Optional) : The maximum length of the mp3 files in total.
+        fallbacks (Optional)  : TTS modules to hedge slow requests with and to fail over to, in order.
 
     Notes:
-        tts_module must take the arguments text and filepath.
+        tts_module must take the arguments text and filepath. It can raise
+        utils.rate_limit.RateLimitError when the service rate limits it, and set requests_per_second,
+        burst and retryable (the exceptions of passing failures) for utils.rate_limit. A provider
+        whose audio depends on more settings than the voice returns them from audio_settings(), so
+        the TTS cache and the speech rates tell them apart.
     """
 
     def __init__(
@@ -39,8 +94,10 @@ class TTSEngine:
         path: str = "assets/temp/",
         max_length: int = DEFAULT_MAX_LENGTH,
         last_clip_length: int = 0,
+        fallbacks: Sequence = (),
     ):
         self.tts_module = tts_module()
+        self.fallbacks = [fallback() for fallback in fallbacks]
         self.reddit_object = reddit_object
 
         self.redditid = re.sub(r"[^\w\s-]", "", reddit_object["thread_id"])
@@ -48,6 +105,45 @@ class TTSEngine:
         self.max_length = max_length
         self.length = 0
         self.last_clip_length = last_clip_length
+        self.workers = settings.config["settings"]["performance"]["tts_workers"] or getattr(
+            self.tts_module, "max_workers", 1
+        )
+        # the parts of a split comment are read on their own threads, this keeps the number of
+        # requests to every provider at its number of workers
+        self.provider_slots = {
+            type(self.tts_module).__name__: threading.BoundedSemaphore(self.workers)
+        }
+        for fallback in self.fallbacks:
+            self.provider_slots.setdefault(
+                type(fallback).__name__,
+                threading.BoundedSemaphore(getattr(fallback, "max_workers", 1)),
+            )
+        # runs the requests of every provider of the chain while the worker waits for the first file
+        self.hedge_pool = None
+        if self.fallbacks:
+            self.hedge_pool = ThreadPoolExecutor(
+                max_workers=self.workers * (len(self.fallbacks) + 1), thread_name_prefix="tts-hedge"
+            )
+        self.silence_lock = threading.Lock()
+        self.silence_created = False
+        # durations of the files, by file name without .mp3
+        self.durations: Dict[str, float] = {}
+        self.durations_lock = threading.Lock()
+        # texts already read by read_batch, by file name without .mp3
+        self.batched: Dict[str, str] = {}
+        provider = type(self.tts_module).__name__
+        voice = "random"
+        if not settings.config["settings"]["tts"]["random_voice"]:
+            voice = str(settings.config["settings"]["tts"].get(VOICE_SETTINGS.get(provider), ""))
+        # the settings of the provider which change its audio, e.g. the speech rate of LocalTTS
+        audio_settings = getattr(self.tts_module, "audio_settings", None)
+        if audio_settings is not None:
+            voice = "/".join((voice, *audio_settings()))
+        lang = settings.config["reddit"]["thread"]["post_lang"] or ""
+        # what the audio depends on besides the text, for the cache and the speech rate
+        self.voice_key = (provider, voice, lang)
+        # characters read and seconds of audio, to learn the speech rate of the voice
+        self.spoken = [0, 0.0]
 
     def add_periods(
         self,
@@ -67,10 +163,19 @@ class TTSEngine:
             comment["comment_body"] = re.sub(r'\."\.', '".', comment["comment_body"])
 
     def run(self) -> Tuple[int, int]:
+        try:
+            return self.read_all()
+        finally:
+            if self.hedge_pool is not None:
+                self.hedge_pool.shutdown(wait=False)  # the requests which lost are left to finish
+
+    def read_all(self) -> Tuple[int, int]:
         Path(self.path).mkdir(parents=True, exist_ok=True)
         print_step("Saving Text to MP3 files...")
 
         self.add_periods()
+        post = self.reddit_object["thread_post"] if settings.config["settings"]["storymode"] else ""
+        prefetch([self.reddit_object["thread_title"]] + (post if isinstance(post, list) else [post]))
         self.call_tts("title", process_text(self.reddit_object["thread_title"]))
         # processed_text = ##self.reddit_object["thread_post"] != ""
         idx = 0
@@ -78,105 +183,474 @@ class TTSEngine:
         if settings.config["settings"]["storymode"]:
             if settings.config["settings"]["storymodemethod"] == 0:
                 if len(self.reddit_object["thread_post"]) > self.tts_module.max_chars:
-                    self.split_post(self.reddit_object["thread_post"], "postaudio")
+                    for duration in self.split_post(self.reddit_object["thread_post"], "postaudio"):
+                        self.add_length(duration)
                 else:
                     self.call_tts("postaudio", process_text(self.reddit_object["thread_post"]))
             elif settings.config["settings"]["storymodemethod"] == 1:
-                for idx, text in track(enumerate(self.reddit_object["thread_post"])):
-                    self.call_tts(f"postaudio-{idx}", process_text(text))
+                texts = [
+                    (f"postaudio-{idx}", text)
+                    for idx, text in enumerate(self.reddit_object["thread_post"])
+                ]
+                self.read_batch(texts)
+                jobs = [partial(self.read_text, name, text, split=False) for name, text in texts]
+                with closing(self.in_order(jobs)) as results:
+                    for idx, durations in track(enumerate(results)):
+                        for duration in durations:
+                            self.add_length(duration)
 
         else:
-            for idx, comment in track(enumerate(self.reddit_object["comments"]), "Saving..."):
-                # ! Stop creating mp3 files if the length is greater than max length.
-                if self.length > self.max_length and idx > 1:
-                    self.length -= self.last_clip_length
-                    idx -= 1
-                    break
-                if (
-                    len(comment["comment_body"]) > self.tts_module.max_chars
-                ):  # Split the comment if it is too long
-                    self.split_post(comment["comment_body"], idx)  # Split the comment
-                else:  # If the comment is not too long, just call the tts engine
-                    self.call_tts(f"{idx}", process_text(comment["comment_body"]))
+            comments = self.reddit_object["comments"]
+            selected = self.select_comments()
+            texts = [
+                (f"{idx}", comment["comment_body"])
+                for idx, comment in enumerate(comments[:selected])
+            ]
+            prefetch(text for _, text in texts)
+            self.read_batch(texts)
+            jobs = [partial(self.read_text, name, text) for name, text in texts]
+            with closing(self.in_order(jobs)) as results:
+                for idx, durations in track(enumerate(results), "Saving..."):
+                    for duration in durations:
+                        self.add_length(duration)
+                    # ! Stop creating mp3 files if the length is greater than max length.
+                    # Checked before the next comment is read, like the comments were read one by one
+                    if idx + 1 < len(comments) and self.length > self.max_length and idx + 1 > 1:
+                        self.length -= self.last_clip_length
+                        break
+                else:
+                    if selected < len(comments):  # every selected comment fits in the video
+                        idx = selected
+            # the comments after the cutoff which were read ahead aren't part of the video
+            for later in range(idx + 1, len(comments)):
+                for file in (f"{self.path}/{later}.mp3", f"{self.path}/{later}-list.txt"):
+                    if os.path.exists(file):
+                        os.remove(file)
 
+        self.save_durations()
+        speech_rates().update("/".join(self.voice_key), *self.spoken)
+        latency_histograms().save()
         print_substep("Saved Text to MP3 files successfully.", style="bold green")
         return self.length, idx
 
-    def split_post(self, text: str, idx):
-        split_files = []
-        split_text = [
-            x.group().strip()
-            for x in re.finditer(
-                r" *(((.|\n){0," + str(self.tts_module.max_chars) + "})(\.|.$))", text
-            )
-        ]
-        self.create_silence_mp3()
+    def select_comments(self) -> int:
+        """Picks the comments to read from their length and the speech rate of the voice.
 
-        idy = None
+        Going through the comments in order, every comment which is predicted to still fit in
+        max_length is kept, and the kept comments are moved to the front of reddit_object["comments"],
+        in their order, so the screenshots follow them. The comments which don't fit are never sent
+        to the provider.
+
+        Returns:
+            int: How many comments to read, all of them when the voice wasn't measured yet
+        """
+        comments = self.reddit_object["comments"]
+        rate = speech_rates().rate("/".join(self.voice_key))
+        if not settings.config["settings"]["performance"]["predict_comment_length"] or not rate:
+            return len(comments)
+        budget = self.max_length - self.length
+        selected, skipped = [], []
+        for comment in comments:
+            predicted = len(comment["comment_body"]) / rate
+            if predicted <= budget:
+                selected.append(comment)
+                budget -= predicted
+            else:
+                skipped.append(comment)
+        if not selected:
+            return len(comments)
+        comments[:] = selected + skipped
+        print_substep(
+            f"Reading {len(selected)} of {len(comments)} comments, the others won't fit in the video."
+        )
+        return len(selected)
+
+    def in_order(self, jobs: List[Callable[[], List[Optional[float]]]]) -> Iterator[List[float]]:
+        """Runs the jobs on up to self.workers threads and yields their results in order.
+
+        A job only starts once the results before it, minus the number of workers, were consumed, so
+        closing the generator early leaves at most self.workers - 1 jobs which were done for nothing.
+        With one worker the jobs run one after another, exactly like a plain loop. The jobs are
+        measured and profiled as a part of the stage of the calling thread.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tts")
+        pending: Deque[Future] = deque()
+        try:
+            for job in jobs:
+                pending.append(executor.submit(in_stage(job)))
+                if len(pending) >= self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def read_text(self, name: str, text: str, split: bool = True) -> List[Optional[float]]:
+        """Reads a comment (or a part of the post) to {name}.mp3, in parts if it's too long.
+
+        Returns:
+            List[Optional[float]]: The durations of the files read, in order
+        """
+        if split and len(text) > self.tts_module.max_chars:  # Split the comment if it is too long
+            return self.split_post(text, name)
+        # If the comment is not too long, just call the tts engine
+        return [self.synthesize(name, process_text(text))]
+
+    def split_post(self, text: str, idx) -> List[Optional[float]]:
+        """Reads the parts of a long text at the same time, then joins them to {idx}.mp3 with a
+        single ffmpeg concat followed by the silence.
+
+        Returns:
+            List[Optional[float]]: The durations of the parts, in order
+        """
+        split_text = chunk_text(text, self.tts_module.max_chars)
+        parts = []
         for idy, text_cut in enumerate(split_text):
             newtext = process_text(text_cut)
-            # print(f"{idx}-{idy}: {newtext}\n")
-
             if not newtext or newtext.isspace():
                 print("newtext was blank because sanitized split text resulted in none")
                 continue
-            else:
-                self.call_tts(f"{idx}-{idy}.part", newtext)
-                with open(f"{self.path}/list.txt", "w") as f:
-                    for idz in range(0, len(split_text)):
-                        f.write("file " + f"'{idx}-{idz}.part.mp3'" + "\n")
-                    split_files.append(str(f"{self.path}/{idx}-{idy}.part.mp3"))
-                    f.write("file " + f"'silence.mp3'" + "\n")
-
-                os.system(
-                    "ffmpeg -f concat -y -hide_banner -loglevel panic -safe 0 "
-                    + "-i "
-                    + f"{self.path}/list.txt "
-                    + "-c copy "
-                    + f"{self.path}/{idx}.mp3"
-                )
+            parts.append((f"{idx}-{idy}.part", newtext))
+        self.create_silence_mp3()
+
+        # the provider calls are limited by self.provider_slots, not by the size of this pool
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, len(parts)) or 1, thread_name_prefix="tts-part"
+        ) as executor:
+            durations = list(executor.map(in_stage(lambda part: self.synthesize(*part)), parts))
+
+        split_files = [
+            f"{self.path}/{name}.mp3"
+            for name, _ in parts
+            if os.path.exists(f"{self.path}/{name}.mp3")
+        ]
+        with open(f"{self.path}/{idx}-list.txt", "w") as f:
+            for split_file in split_files:
+                f.write("file " + f"'{os.path.basename(split_file)}'" + "\n")
+            f.write("file " + f"'silence.mp3'" + "\n")
+        if os.path.exists(f"{self.path}/{idx}.mp3"):  # can be a link to the cache
+            os.remove(f"{self.path}/{idx}.mp3")
+        with metrics.measure(
+            self.redditid, f"ffmpeg:concat:{idx}", outputs=[f"{self.path}/{idx}.mp3"]
+        ):
+            metrics.count("ffmpeg")
+            try:
+                ffmpeg.input(f"{self.path}/{idx}-list.txt", f="concat", safe=0).output(
+                    f"{self.path}/{idx}.mp3", c="copy"
+                ).overwrite_output().run(quiet=True)
+            except ffmpeg.Error as e:
+                print(e.stderr.decode("utf8", errors="replace"))
+
         try:
-            for i in range(0, len(split_files)):
-                os.unlink(split_files[i])
+            for split_file in split_files:
+                os.unlink(split_file)
         except FileNotFoundError as e:
             print("File not found: " + e.filename)
         except OSError:
             print("OSError")
+        if os.path.exists(f"{self.path}/{idx}.mp3"):
+            self.record_duration(f"{idx}", self.measure_duration(f"{self.path}/{idx}.mp3"))
+        return durations
+
+    def call_tts(self, filename: str, text: str) -> Optional[float]:
+        duration = self.synthesize(filename, text)
+        self.add_length(duration)
+        return duration
+
+    def synthesize(self, filename: str, text: str) -> Optional[float]:
+        """Reads the text to {filename}.mp3, safe to call from several threads.
+
+        Returns:
+            Optional[float]: The duration of the file, None if it can't be read
+        """
+        check_stop()
+        filepath = f"{self.path}/{filename}.mp3"
+        cache = tts_cache()
+        key = cache.key(*self.voice_key, text) if cache is not None else None
+        with metrics.measure(self.redditid, f"tts:{filename}", outputs=[filepath]):
+            if key is not None:
+                duration = cache.get(key, filepath)
+                if duration is not None:
+                    metrics.count("tts_cache_hit")
+                    self.record_duration(filename, duration, text)
+                    return duration
+            with self.durations_lock:
+                batched = self.batched.pop(filename, None) == text
+            if batched and os.path.exists(filepath):
+                chosen = True  # already read by read_batch
+            else:
+                chosen = self.request(text, filepath)
+        duration = self.measure_duration(filepath)
+        if duration is None:
+            return None
+        if not chosen:  # read by a fallback, in another voice than the key and the speech rate
+            self.record_duration(filename, duration)
+            return duration
+        if key is not None:
+            cache.put(key, filepath, duration)
+        self.record_duration(filename, duration, text)
+        return duration
+
+    def request(self, text: str, filepath: str) -> bool:
+        """Has the provider read the text to filepath, within its rate limit.
+
+        With fallbacks, a request still running after the p95 latency of its provider is sent to
+        the next provider of the chain as well, and the first file done is kept. The p95 is counted
+        from when the provider is called, the time spent waiting for its slot and rate limit isn't
+        slowness. A provider which fails, or returns without writing the file, hands the text to the
+        next one, the error is only raised when all of them failed. The requests which lost give
+        their slot back right away.
+
+        Returns:
+            bool: Whether the file was read by the chosen provider, False for a fallback
+        """
+        metrics.count("tts_request")
+        if os.path.exists(filepath):  # it can be a link to the cache, don't write through it
+            os.remove(filepath)
+        if not self.fallbacks:
+            self.call_provider(self.tts_module, text, filepath)
+            return True
+
+        providers = [self.tts_module] + self.fallbacks
+        paths = [f"{filepath[:-4]}.{type(provider).__name__}.hedge.mp3" for provider in providers]
+        running: Dict[Future, int] = {}
+        # when every provider of the chain was called, None while it waits for its slot
+        started: List[Optional[float]] = []
+        # set when a provider is called or a request is done
+        changed = threading.Event()
+        hedge = Hedge()
+        error = None
+
+        def called(index: int) -> None:
+            started[index] = time.monotonic()
+            changed.set()
+
+        def start() -> None:
+            index = len(started)
+            started.append(None)
+            future = self.hedge_pool.submit(
+                in_stage(self.call_provider),
+                providers[index],
+                text,
+                paths[index],
+                partial(called, index),
+                hedge,
+                index,
+            )
+            future.add_done_callback(lambda _: changed.set())
+            running[future] = index
+
+        start()
+        try:
+            while running:
+                changed.clear()
+                done = [future for future in running if future.done()]
+                if not done:
+                    timeout = None
+                    if len(started) < len(providers) and started[-1] is not None:
+                        p95 = latency_histograms().quantile(
+                            type(providers[len(started) - 1]).__name__, 0.95
+                        )
+                        if p95 is not None:
+                            timeout = max(0.0, started[-1] + p95 - time.monotonic())
+                    if not changed.wait(timeout):  # slower than usual, hedge with the next provider
+                        metrics.count("tts_hedge")
+                        start()
+                    continue
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        future.result()
+                        if not os.path.exists(paths[index]) or not os.path.getsize(paths[index]):
+                            raise FileNotFoundError(f"No audio was written to {paths[index]}")
+                    except Exception as e:
+                        self.remove_hedge(paths[index])
+                        error = e
+                        print_substep(
+                            f"{type(providers[index]).__name__} failed to read the text ({e!r}).",
+                            style="yellow",
+                        )
+                        if not running and len(started) < len(providers):
+                            metrics.count("tts_failover")
+                            start()
+                        continue
+                    os.replace(paths[index], filepath)
+                    return index == 0
+            raise error
+        finally:
+            hedge.settle()
+            # the requests which lost keep running, their files are removed once they are done
+            for future, index in running.items():
+                future.cancel()
+                future.add_done_callback(partial(self.remove_hedge, paths[index]))
+
+    @staticmethod
+    def remove_hedge(path: str, future: Optional[Future] = None) -> None:
+        if os.path.exists(path):
+            os.remove(path)
+
+    def call_provider(
+        self,
+        provider,
+        text: str,
+        filepath: str,
+        called: Optional[Callable[[], None]] = None,
+        hedge: Optional[Hedge] = None,
+        index: int = 0,
+    ) -> None:
+        """Calls the provider within its rate limit, and records how long the request took.
+
+        Args:
+            called (Optional[Callable]): Called every time the request is made, once the provider
+                has a free slot and is within its rate limit.
+            hedge (Optional[Hedge]): The requests of the chain for this text, when it's hedged.
+            index (int): The index of the provider in the chain, with hedge.
+        """
+        name = type(provider).__name__
+
+        def run() -> None:
+            if hedge is not None and hedge.settled:
+                return  # another provider already read the text, don't try again
+            if called is not None:
+                called()
+            start = time.perf_counter()
+            provider.run(
+                text,
+                filepath=filepath,
+                random_voice=settings.config["settings"]["tts"]["random_voice"],
+            )
+            latency_histograms().record(name, time.perf_counter() - start)
+
+        def limited() -> None:
+            rate_limit.call(
+                name,
+                run,
+                rate=getattr(provider, "requests_per_second", None),
+                burst=getattr(provider, "burst", getattr(provider, "max_workers", 1)),
+                retryable=getattr(provider, "retryable", ()),
+            )
+
+        if hedge is None:
+            with self.provider_slots[name]:
+                limited()
+            return
+        if not hedge.acquire(index, self.provider_slots[name]):
+            return  # another provider read the text while this one waited for a slot
+        try:
+            limited()
+        finally:
+            hedge.release(index)
+
+    def read_batch(self, texts: List[Tuple[str, str]]) -> None:
+        """Reads the texts with a single call to the run_batch method of the provider, if it has one.
+
+        Some providers are much faster that way, e.g. pyttsx drains all of its queue in one
+        runAndWait. The texts which are cached or too long to be read at once are left out, and
+        synthesize() only picks up the files made here.
+
+        Args:
+            texts (List[Tuple[str, str]]): The file names without .mp3 and the texts, unprocessed.
+        """
+        run_batch = getattr(self.tts_module, "run_batch", None)
+        if run_batch is None:
+            return
+        cache = tts_cache()
+        clips = {}
+        for filename, text in texts:
+            if len(text) > self.tts_module.max_chars:
+                continue
+            text = process_text(text)
+            if cache is not None and cache.key(*self.voice_key, text) in cache:
+                continue
+            clips[filename] = text
+        if not clips:
+            return
+        filepaths = [f"{self.path}/{filename}.mp3" for filename in clips]
+        for filepath in filepaths:
+            if os.path.exists(filepath):  # it can be a link to the cache
+                os.remove(filepath)
+        with metrics.measure(self.redditid, "tts:batch", outputs=filepaths):
+            metrics.count("tts_request", len(clips))
+            try:
+                run_batch(
+                    list(zip(clips.values(), filepaths)),
+                    random_voice=settings.config["settings"]["tts"]["random_voice"],
+                )
+            except Exception as e:
+                if not self.fallbacks:
+                    raise
+                # read one by one by synthesize(), which fails over to the fallbacks
+                print_substep(f"Reading the texts at once failed ({e!r}).", style="yellow")
+                return
+        with self.durations_lock:
+            self.batched.update(clips)
+
+    @staticmethod
+    def measure_duration(filepath: str) -> Optional[float]:
+        """The duration of an audio file from its headers, or with moviepy for unknown formats."""
+        duration = audio_duration(filepath)
+        if duration is not None:
+            return duration
+        from moviepy.editor import AudioFileClip
 
-    def call_tts(self, filename: str, text: str):
-        self.tts_module.run(
-            text,
-            filepath=f"{self.path}/{filename}.mp3",
-            random_voice=settings.config["settings"]["tts"]["random_voice"],
-        )
-        # try:
-        #     self.length += MP3(f"{self.path}/{filename}.mp3").info.length
-        # except (MutagenError, HeaderNotFoundError):
-        #     self.length += sox.file_info.duration(f"{self.path}/{filename}.mp3")
         try:
-            clip = AudioFileClip(f"{self.path}/{filename}.mp3")
-            self.last_clip_length = clip.duration
-            self.length += clip.duration
+            clip = AudioFileClip(filepath)
+            duration = clip.duration
             clip.close()
         except:
+            return None
+        return duration
+
+    def record_duration(self, filename: str, duration: Optional[float], text: str = "") -> None:
+        if duration is not None:
+            with self.durations_lock:
+                self.durations[filename] = duration
+                if text:  # read by the provider, not joined from parts
+                    self.spoken[0] += len(text)
+                    self.spoken[1] += duration
+
+    def save_durations(self) -> None:
+        """Writes the durations of the files of the video to mp3/durations.json for the render."""
+        with self.durations_lock:
+            durations = {
+                name: duration
+                for name, duration in self.durations.items()
+                if os.path.exists(f"{self.path}/{name}.mp3")  # not the parts or the cut comments
+            }
+        save_durations(self.path, durations)
+
+    def add_length(self, duration: Optional[float]) -> None:
+        if duration is None:  # the file couldn't be read
             self.length = 0
+            return
+        self.last_clip_length = duration
+        self.length += duration
 
     def create_silence_mp3(self):
+        with self.silence_lock:  # split comments are read at the same time
+            if not self.silence_created:
+                self.write_silence_mp3()
+                self.silence_created = True
+
+    def write_silence_mp3(self):
+        """Writes silence.mp3 with the anullsrc source of ffmpeg, once per run."""
         silence_duration = settings.config["settings"]["tts"]["silence_duration"]
-        silence = AudioClip(
-            make_frame=lambda t: np.sin(440 * 2 * np.pi * t),
-            duration=silence_duration,
-            fps=44100,
-        )
-        silence = volumex(silence, 0)
-        silence.write_audiofile(f"{self.path}/silence.mp3", fps=44100, verbose=False, logger=None)
+        with metrics.measure(self.redditid, "ffmpeg:silence", outputs=[f"{self.path}/silence.mp3"]):
+            metrics.count("ffmpeg")
+            ffmpeg.input("anullsrc=r=44100:cl=mono", f="lavfi", t=silence_duration).output(
+                f"{self.path}/silence.mp3"
+            ).overwrite_output().run(quiet=True)
+
+
+def in_stage(job: Callable) -> Callable:
+    """Wraps a job for a worker thread, so it's measured and profiled as a part of the stage of the
+    calling thread."""
+    return profiling.inherit(metrics.inherit(job))
 
 
 def process_text(text: str, clean: bool = True):
     lang = settings.config["reddit"]["thread"]["post_lang"]
     new_text = sanitize_text(text) if clean else text
     if lang:
-        print_substep("Translating Text...")
-        translated_text = translators.translate_text(text, translator="google", to_language=lang)
-        new_text = sanitize_text(translated_text)
+        new_text = sanitize_text(translate(text, lang))
     return new_text
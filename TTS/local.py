@@ -0,0 +1,67 @@
+import hashlib
+import random
+import time
+
+import ffmpeg
+
+from utils import settings
+
+# the pitch in Hz of every voice, so the voices can be told apart when listening to a video
+voices = {
+    "bass": 110,
+    "baritone": 165,
+    "tenor": 220,
+    "alto": 330,
+    "soprano": 440,
+}
+
+
+class LocalTTS:
+    """Offline Text-to-Speech, for benchmarks, CI and when every other provider is down.
+
+    It reads nothing: every clip is a tone as long as the text would take to say at
+    settings.tts.local_chars_per_second. The same text and voice always give the same file, and the
+    latency and jitter settings make it wait like a network provider would.
+    """
+
+    def __init__(self):
+        self.max_chars = 1000
+        self.max_workers = 8
+        self.voices = list(voices)
+
+    def run(self, text: str, filepath: str, random_voice: bool = False):
+        tts_settings = settings.config["settings"]["tts"]
+        # seeded by the text, so the voice and the jitter don't change from a run to the next
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        if random_voice:
+            voice = rng.choice(self.voices)
+        else:
+            voice = str(tts_settings.get("local_voice") or "tenor").lower()
+            if voice not in voices:
+                raise ValueError(
+                    f"Please set the config variable LOCAL_VOICE to a valid voice. options are: {self.voices}"
+                )
+
+        latency = float(tts_settings.get("local_latency") or 0)
+        jitter = float(tts_settings.get("local_jitter") or 0)
+        if latency or jitter:
+            time.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+
+        chars_per_second = self.chars_per_second()
+        duration = max(0.5, len(text) / chars_per_second)
+        # mono 44.1 kHz like silence.mp3, so split comments can be joined without re-encoding
+        ffmpeg.input(
+            f"sine=frequency={voices[voice]}:duration={duration:.3f}:sample_rate=44100",
+            f="lavfi",
+        ).output(filepath, ac=1, **{"b:a": "64k"}).overwrite_output().run(quiet=True)
+
+    @staticmethod
+    def chars_per_second() -> float:
+        return float(settings.config["settings"]["tts"].get("local_chars_per_second") or 15)
+
+    def audio_settings(self) -> tuple:
+        """What the clips depend on besides the text and the voice, for the TTS cache."""
+        return (f"{self.chars_per_second():g}cps",)
+
+    def randomvoice(self):
+        return random.choice(self.voices)
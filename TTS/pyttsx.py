@@ -1,21 +1,31 @@
 import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 
 import pyttsx3
 
 from utils import settings
 
+# the engines of pyttsx3 are tied to the thread which made them (COM for sapi5, the run loop for
+# nsss), so a single thread makes the engine and reads every clip of every instance
+_speaker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyttsx")
+_engine = None
+
 
 class pyttsx:
+    """System Text-to-Speech Wrapper
+
+    The speech engine is started once and kept for the run, on its own thread: the TTS threads hand
+    it their clips and wait. run_batch queues every clip and has the engine read them all in a
+    single runAndWait.
+    """
+
     def __init__(self):
         self.max_chars = 5000
+        self.max_workers = 1  # the system speech engine can't be used from several threads
         self.voices = []
 
-    def run(
-        self,
-        text: str,
-        filepath: str,
-        random_voice=False,
-    ):
+    def voice_id(self, random_voice: bool = False) -> int:
         voice_id = settings.config["settings"]["tts"]["python_voice"]
         voice_num = settings.config["settings"]["tts"]["py_voice_num"]
         if voice_id == "" or voice_num == "":
@@ -25,17 +35,40 @@ class pyttsx:
         else:
             voice_id = int(voice_id)
             voice_num = int(voice_num)
-        for i in range(voice_num):
-            self.voices.append(i)
-            i = +1
+        self.voices = list(range(voice_num))
         if random_voice:
             voice_id = self.randomvoice()
-        engine = pyttsx3.init()
-        voices = engine.getProperty("voices")
-        engine.setProperty(
-            "voice", voices[voice_id].id
-        )  # changing index changes voices but ony 0 and 1 are working here
-        engine.save_to_file(text, f"{filepath}")
+        return voice_id
+
+    @staticmethod
+    def start():
+        """The speech engine, only use it on the thread of _speaker."""
+        global _engine
+        if _engine is None:
+            _engine = pyttsx3.init()
+        return _engine
+
+    def run(
+        self,
+        text: str,
+        filepath: str,
+        random_voice=False,
+    ):
+        self.run_batch([(text, filepath)], random_voice)
+
+    def run_batch(self, clips: List[Tuple[str, str]], random_voice=False):
+        """Reads every (text, filepath) of clips, in one go of the speech engine."""
+        _speaker.submit(self.speak, clips, random_voice).result()
+
+    def speak(self, clips: List[Tuple[str, str]], random_voice=False):
+        engine = self.start()
+        engine_voices = engine.getProperty("voices")
+        for text, filepath in clips:
+            # the property is queued with the file, so every clip can get its own random voice
+            engine.setProperty(
+                "voice", engine_voices[self.voice_id(random_voice)].id
+            )  # changing index changes voices but ony 0 and 1 are working here
+            engine.save_to_file(text, f"{filepath}")
         engine.runAndWait()
 
     def randomvoice(self):
@@ -1,10 +1,11 @@
+import asyncio
+import json
 import random
 
-import requests
-from requests.exceptions import JSONDecodeError
+import aiohttp
 
-from utils import settings
-from utils.voice import check_ratelimit
+from utils import http_client, settings
+from utils.rate_limit import RateLimitError
 
 voices = [
     "Brian",
@@ -29,12 +30,24 @@ voices = [
 
 
 class StreamlabsPolly:
+    """Streamlabs Polly Text-to-Speech Wrapper
+
+    The requests are made on the shared HTTP event loop (utils/http_client.py), over keep-alive
+    connections with connect and read timeouts.
+    """
+
     def __init__(self):
         self.url = "https://streamlabs.com/polly/speak"
         self.max_chars = 550
+        self.max_workers = 2
+        self.requests_per_second = 2
+        self.retryable = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
         self.voices = voices
 
     def run(self, text, filepath, random_voice: bool = False):
+        http_client.run(self.arun(text, filepath, random_voice))
+
+    async def arun(self, text, filepath, random_voice: bool = False):
         if random_voice:
             voice = self.randomvoice()
         else:
@@ -46,22 +59,26 @@ class StreamlabsPolly:
 
         body = {"voice": voice, "text": text, "service": "polly"}
         headers = {"Referer": "https://streamlabs.com/"}
-        response = requests.post(self.url, headers=headers, data=body)
+        session = http_client.session()
+        async with session.post(self.url, headers=headers, data=body) as response:
+            if response.status == 429:
+                raise RateLimitError.from_headers(response.headers, "Streamlabs Polly rate limit")
+            content = await response.read()
 
-        if not check_ratelimit(response):
-            self.run(text, filepath, random_voice)
-
-        else:
-            try:
-                voice_data = requests.get(response.json()["speak_url"])
-                with open(filepath, "wb") as f:
-                    f.write(voice_data.content)
-            except (KeyError, JSONDecodeError):
-                try:
-                    if response.json()["error"] == "No text specified!":
-                        raise ValueError("Please specify a text to convert to speech.")
-                except (KeyError, JSONDecodeError):
-                    print("Error occurred calling Streamlabs Polly")
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            print("Error occurred calling Streamlabs Polly")
+            return
+        if "speak_url" not in data:
+            if data.get("error") == "No text specified!":
+                raise ValueError("Please specify a text to convert to speech.")
+            print("Error occurred calling Streamlabs Polly")
+            return
+        async with session.get(data["speak_url"]) as voice_data:
+            audio = await voice_data.read()
+        with open(filepath, "wb") as f:
+            f.write(audio)
 
     def randomvoice(self):
         return random.choice(self.voices)
@@ -0,0 +1,102 @@
+"""Micro-benchmark of the text chunker of TTSEngine.split_post against the regex it replaced.
+
+The regex backtracks over the whole window at every position where no period can be reached, so
+it's slow on long texts with few periods. It also drops the text it can't match. This times both
+on adversarial texts and reports how many characters every one of them lost.
+
+    python -m benchmarks.chunker
+    python -m benchmarks.chunker --max-chars 5000 --length 50000 --json chunker.json
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from rich.table import Table
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import WORDS, paragraph
+from utils.console import console
+from utils.voice import chunk_text
+
+
+def regex_chunks(text: str, max_chars: int) -> List[str]:
+    """The chunker split_post used before."""
+    return [
+        x.group().strip()
+        for x in re.finditer(r" *(((.|\n){0," + str(max_chars) + "})(\.|.$))", text)
+    ]
+
+
+def texts(length: int, seed: int) -> Dict[str, str]:
+    """Texts of the given length, from the usual comment to the worst case of the regex."""
+    rng = random.Random(seed)
+    words = " ".join(rng.choice(WORDS) for _ in range(length // 4))[:length]
+    return {
+        "sentences": paragraph(rng, length),
+        "no periods": words,
+        "one period at the end": words[:-1] + ".",
+        "clauses only": ", ".join(words[i : i + 60] for i in range(0, length, 60))[:length],
+        "no whitespace": "a" * length,
+        "line breaks": "\n".join(words[i : i + 80] for i in range(0, length, 80))[:length],
+    }
+
+
+def timed(chunker: Callable[[str, int], List[str]], text: str, max_chars: int, runs: int) -> dict:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        chunks = chunker(text, max_chars)
+        best = min(best, time.perf_counter() - start)
+    kept = sum(len("".join(chunk.split())) for chunk in chunks)
+    return {
+        "seconds": best,
+        "chunks": len(chunks),
+        "longest": max((len(chunk) for chunk in chunks), default=0),
+        "lost_chars": len("".join(text.split())) - kept,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-chars", type=int, default=5000, help="max_chars of the provider")
+    parser.add_argument("--length", type=int, default=20000, help="characters of every text")
+    parser.add_argument("--runs", type=int, default=3, help="the best of this many runs is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, text in texts(args.length, args.seed).items():
+        results[name] = {
+            "regex": timed(regex_chunks, text, args.max_chars, args.runs),
+            "chunk_text": timed(chunk_text, text, args.max_chars, args.runs),
+        }
+
+    table = Table(title=f"{args.length} characters, max_chars {args.max_chars}")
+    for column in ("text", "regex (s)", "chunk_text (s)", "speedup", "chunks", "lost chars"):
+        table.add_column(column, justify="right")
+    for name, result in results.items():
+        before, after = result["regex"], result["chunk_text"]
+        table.add_row(
+            name,
+            f"{before['seconds']:.4f}",
+            f"{after['seconds']:.6f}",
+            f"{before['seconds'] / max(after['seconds'], 1e-9):.0f}x",
+            f"{before['chunks']} / {after['chunks']}",
+            f"{before['lost_chars']} / {after['lost_chars']}",
+        )
+    console.print(table)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
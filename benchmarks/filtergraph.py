@@ -0,0 +1,178 @@
+"""Scaling benchmark of the final_video filtergraph versus the number of comments.
+
+make_final_video chains one overlay filter per comment on the background stream. This sweeps the
+number of overlays on synthetic media and records, for every point, how long building the
+filtergraph takes, the encode speed in frames per second and the peak RSS of the ffmpeg process.
+
+    python -m benchmarks.filtergraph
+    python -m benchmarks.filtergraph --counts 1 5 10 --json filtergraph.json
+    python -m benchmarks.filtergraph --baseline filtergraph.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ffmpeg
+from rich.table import Table
+
+from benchmarks.synthetic import comment_cards, default_config, reddit_object, workspace
+from utils import settings
+from utils.console import console, print_step, print_substep
+
+settings.config = default_config()
+# translators looks up the region of the machine online when it's imported
+os.environ.setdefault("translators_default_region", "EN")
+
+from utils.governor import ffmpeg_threads
+from video_creation.final_video import build_overlay_chain
+
+FPS = 30
+
+
+def background(width: int, height: int, seconds: float) -> str:
+    path = f"assets/backgrounds/video/benchmark-{width}x{height}-{seconds}.mp4"
+    if not os.path.exists(path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        ffmpeg.input(
+            f"testsrc2=size={width}x{height}:rate={FPS}:duration={seconds}", f="lavfi"
+        ).output(path, **{"c:v": "libx264", "preset": "ultrafast", "pix_fmt": "yuv420p"}).run(
+            quiet=True
+        )
+    return path
+
+
+def encode(args: List[str]) -> dict:
+    """Runs ffmpeg and returns its wall time and peak RSS."""
+    # the progress lines of a long encode would fill a pipe and block ffmpeg before wait4 returns
+    with tempfile.TemporaryFile() as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=log)
+        if hasattr(os, "wait4"):
+            # the rusage of this ffmpeg only, RUSAGE_CHILDREN would keep the peak of the earlier runs
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        else:
+            process.wait()
+            peak_rss = None
+        wall = time.perf_counter() - start
+        log.seek(0)
+        stderr = log.read().decode("utf8", errors="replace")
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed:\n{stderr}")
+    return {"wall": wall, "peak_rss": peak_rss}
+
+
+def measure(overlays: int, width: int, height: int, seconds: float, reddit_id: str) -> dict:
+    """Renders a video with the given number of comment overlays."""
+    path = f"results/filtergraph-{overlays}.mp4"
+    start = time.perf_counter()
+    background_clip = ffmpeg.input(background(width, height, seconds))
+    screenshot_width = int((width * 45) // 100)
+    image_clips = [
+        ffmpeg.input(f"assets/temp/{reddit_id}/png/comment_{i}.png")["v"].filter(
+            "scale", screenshot_width, -1
+        )
+        for i in range(overlays)
+    ]
+    background_clip = build_overlay_chain(
+        background_clip, image_clips, [seconds / overlays] * overlays, opacity=0.9
+    )
+    audio = ffmpeg.input(f"sine=frequency=220:duration={seconds}", f="lavfi")
+    args = ffmpeg.compile(
+        ffmpeg.output(
+            background_clip.filter("scale", width, height),
+            audio,
+            path,
+            f="mp4",
+            **{"c:v": "h264", "b:v": "20M", "b:a": "192k", "threads": ffmpeg_threads()},
+        ).overwrite_output()
+    )
+    build = time.perf_counter() - start
+    result = encode(args)
+    return {
+        "overlays": overlays,
+        "build_seconds": round(build, 4),
+        "encode_seconds": round(result["wall"], 3),
+        "encode_fps": round(seconds * FPS / result["wall"], 2),
+        "peak_rss": result["peak_rss"],
+    }
+
+
+def compare(points: List[dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Returns the points which encode slower than the baseline by more than the tolerance."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {point["overlays"]: point for point in json.load(f)["points"]}
+    regressions = []
+    for point in points:
+        before = baseline.get(point["overlays"])
+        if before is None:
+            continue
+        if point["encode_fps"] < before["encode_fps"] * (1 - tolerance):
+            regressions.append(
+                f"{point['overlays']} overlays: {point['encode_fps']} fps, "
+                f"the baseline is {before['encode_fps']} fps"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--resolution", default="1080x1920", help="width x height of the video")
+    parser.add_argument("--seconds", type=float, default=20, help="length of every video")
+    parser.add_argument("--workdir", help="keep the scratch files (and background media) here")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of an earlier run to compare the fps with")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.15, help="allowed fps drop, 0.15 is 15%%"
+    )
+    args = parser.parse_args(argv)
+    width, height = (int(size) for size in args.resolution.lower().split("x"))
+
+    points = []
+    with workspace(args.workdir):
+        reddit_obj = reddit_object(comments=max(args.counts), comment_length=300)
+        comment_cards(reddit_obj)
+        Path("results").mkdir(exist_ok=True)
+        background(width, height, args.seconds)
+        for overlays in args.counts:
+            print_step(f"Rendering {overlays} overlays")
+            points.append(measure(overlays, width, height, args.seconds, reddit_obj["thread_id"]))
+
+    table = Table(title=f"{args.seconds:g}s at {width}x{height}, {ffmpeg_threads()} threads")
+    for column in ("overlays", "build (s)", "encode (s)", "fps", "peak RSS (MiB)"):
+        table.add_column(column, justify="right")
+    for point in points:
+        table.add_row(
+            str(point["overlays"]),
+            f"{point['build_seconds']:.4f}",
+            f"{point['encode_seconds']:.2f}",
+            f"{point['encode_fps']:.1f}",
+            f"{point['peak_rss'] / 2**20:.0f}" if point["peak_rss"] else "-",
+        )
+    console.print(table)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "points": points}, f, indent=4)
+    if args.baseline:
+        regressions = compare(points, args.baseline, args.tolerance)
+        for regression in regressions:
+            print_substep(regression, style="red")
+        if regressions:
+            return 1
+        print_substep("No regression against the baseline.", style="bold green")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
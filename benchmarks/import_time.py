@@ -0,0 +1,108 @@
+"""Import time benchmark of the bot.
+
+Imports a module in a fresh interpreter with python -X importtime, and reports how long it took,
+the slowest packages and which of the heavy optional dependencies got loaded with it.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module video_creation.final_video --runs 10 --top 20
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from rich.table import Table
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from utils.console import console
+
+# loaded only when the config needs them
+HEAVY = [
+    "torch",
+    "transformers",
+    "spacy",
+    "moviepy",
+    "playwright",
+    "yt_dlp",
+    "translators",
+    "boto3",
+    "elevenlabs",
+    "pyttsx3",
+    "gtts",
+]
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_once(module: str) -> Dict[str, int]:
+    """Imports the module in a new interpreter, returns the cumulative time in µs of every module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="the module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="how many packages to list")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    runs = [import_once(args.module) for _ in range(args.runs)]
+    total = statistics.median(run[args.module] for run in runs) / 1e6
+    # the cumulative time of the top level packages, e.g. praw for praw.models.reddit
+    packages: Dict[str, List[int]] = defaultdict(list)
+    for run in runs:
+        for name, micros in run.items():
+            if "." not in name and name != args.module:
+                packages[name].append(micros)
+    slowest = sorted(
+        ((name, statistics.median(times) / 1e6) for name, times in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: args.top]
+    loaded = [name for name in HEAVY if name in runs[0]]
+
+    table = Table(title=f"import {args.module}: {total:.3f}s (median of {args.runs})")
+    table.add_column("package")
+    table.add_column("seconds", justify="right")
+    for name, seconds in slowest:
+        table.add_row(name, f"{seconds:.3f}", style="red" if name in HEAVY else None)
+    console.print(table)
+    console.print(f"Heavy dependencies loaded: {', '.join(loaded) or 'none'}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "module": args.module,
+                    "seconds": total,
+                    "packages": dict(slowest),
+                    "heavy": loaded,
+                },
+                f,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""End to end benchmark of a video build with synthetic inputs.
+
+Drives TTSEngine, the screenshots (imagemaker in story mode, drawn cards otherwise),
+chop_background and make_final_video the same way main.py does, and reports the wall time of
+every stage, the seconds spent per second of video and the peak memory.
+
+    python -m benchmarks.pipeline --comments 20 --comment-length 200
+    python -m benchmarks.pipeline --storymode --comments 40 --runs 3 --json results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import statistics
+import sys
+from pathlib import Path
+from typing import List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rich.table import Table
+
+from benchmarks.synthetic import (
+    background_media,
+    comment_cards,
+    default_config,
+    reddit_object,
+    workspace,
+)
+from utils import metrics, settings
+from utils.console import console, print_step
+
+settings.config = default_config()
+# translators looks up the region of the machine online when it's imported
+os.environ.setdefault("translators_default_region", "EN")
+
+# imported after the settings, and before entering the workspace: background.py reads
+# utils/background_*.json relative to the working directory when it's imported
+from utils.imagenarator import imagemaker
+from video_creation.background import chop_background
+from video_creation.final_video import make_final_video
+from video_creation.voices import save_text_to_mp3
+
+STAGES = ["tts", "screenshots", "chop_background", "make_final_video"]
+
+
+def peak_rss() -> dict:
+    if resource is None:
+        return {"self": None, "children": None}
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    }
+
+
+def build(args: argparse.Namespace) -> dict:
+    """Makes one video and returns its measurements."""
+    reddit_obj = reddit_object(args.comments, args.comment_length, args.storymode, args.seed)
+    reddit_id = reddit_obj["thread_id"]
+    shutil.rmtree(f"assets/temp/{reddit_id}", ignore_errors=True)
+
+    with metrics.measure(reddit_id, "tts"):
+        length, number_of_clips = save_text_to_mp3(reddit_obj)
+    # not measured, it stands in for the background download
+    background_config = background_media(math.ceil(length) + 30, args.background_size)
+    with metrics.measure(reddit_id, "screenshots"):
+        if args.storymode:
+            imagemaker(theme=(33, 33, 36, 255), reddit_obj=reddit_obj, txtclr=(240, 240, 240))
+        else:
+            comment_cards(reddit_obj, settings.config["settings"]["theme"])
+    with metrics.measure(reddit_id, "chop_background"):
+        chop_background(background_config, math.ceil(length), reddit_obj)
+    with metrics.measure(reddit_id, "make_final_video"):
+        path = make_final_video(number_of_clips, math.ceil(length), reddit_obj, background_config)
+
+    records = metrics.pop(reddit_id)
+    stages = {record["stage"]: record for record in records if record["depth"] == 0}
+    total = sum(stages[name]["wall"] for name in STAGES)
+    return {
+        "video": path,
+        "video_seconds": math.ceil(length),
+        "clips": number_of_clips,
+        "wall": round(total, 3),
+        "seconds_per_output_second": round(total / max(1, math.ceil(length)), 4),
+        "stages": {name: stages[name]["wall"] for name in STAGES},
+        "records": records,
+    }
+
+
+def report(runs: List[dict]) -> dict:
+    summary = {
+        "video_seconds": runs[0]["video_seconds"],
+        "seconds_per_output_second": statistics.median(
+            run["seconds_per_output_second"] for run in runs
+        ),
+        "stages": {name: statistics.median(run["stages"][name] for run in runs) for name in STAGES},
+        "peak_rss": peak_rss(),
+    }
+    table = Table(title=f"{len(runs)} run(s), median of a {summary['video_seconds']}s video")
+    table.add_column("stage")
+    table.add_column("seconds", justify="right")
+    table.add_column("per output second", justify="right")
+    for name, wall in summary["stages"].items():
+        table.add_row(name, f"{wall:.2f}", f"{wall / max(1, summary['video_seconds']):.3f}")
+    table.add_row(
+        "total",
+        f"{sum(summary['stages'].values()):.2f}",
+        f"{summary['seconds_per_output_second']:.3f}",
+        style="bold",
+    )
+    console.print(table)
+    for who, rss in summary["peak_rss"].items():
+        if rss is not None:
+            console.print(f"Peak RSS ({who}): {rss / 2**20:.1f} MiB")
+    return summary
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--comments", type=int, default=20, help="comments (or story sentences)")
+    parser.add_argument("--comment-length", type=int, default=200, help="characters per comment")
+    parser.add_argument("--storymode", action="store_true", help="storymodemethod 1 with imagemaker")
+    parser.add_argument("--tts-rate", type=float, default=15, help="characters per second")
+    parser.add_argument("--tts-latency", type=float, default=0, help="seconds per TTS request")
+    parser.add_argument("--tts-jitter", type=float, default=0, help="variation of the latency")
+    parser.add_argument(
+        "--tts-cache",
+        action="store_true",
+        help="keep the TTS cache and the learned speech rates between the runs; they live in the "
+        "workspace, so they are only kept across invocations with the same --workdir",
+    )
+    parser.add_argument("--resolution", default="1080x1920", help="width x height of the video")
+    parser.add_argument("--background-size", default="1920x1080", help="size of the background")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="keep the scratch files (and background media) here")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    width, height = args.resolution.lower().split("x")
+    settings.config["settings"]["resolution_w"] = int(width)
+    settings.config["settings"]["resolution_h"] = int(height)
+    settings.config["settings"]["storymode"] = args.storymode
+    settings.config["settings"]["storymodemethod"] = 1
+    tts = settings.config["settings"]["tts"]
+    tts["voice_choice"] = "local"
+    tts["local_chars_per_second"] = args.tts_rate
+    tts["local_latency"] = args.tts_latency
+    tts["local_jitter"] = args.tts_jitter
+    if not args.tts_cache:
+        # every run reads its clips, instead of hardlinking them from the last one
+        settings.config["settings"]["performance"]["tts_cache_mb"] = 0
+        settings.config["settings"]["performance"]["predict_comment_length"] = False
+    settings.config["reddit"]["thread"]["subreddit"] = "benchmark"
+
+    runs = []
+    with workspace(args.workdir):
+        for run in range(args.runs):
+            print_step(f"Benchmark run {run + 1} of {args.runs}")
+            runs.append(build(args))
+    summary = report(runs)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "summary": summary, "runs": runs}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
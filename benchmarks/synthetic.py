@@ -0,0 +1,175 @@
+"""Synthetic inputs for the benchmarks, so they run without Reddit or YouTube.
+
+The TTS is the local provider (TTS/local.py), set with settings.tts.voice_choice = "local".
+"""
+
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import textwrap
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+import toml
+from PIL import Image, ImageDraw, ImageFont
+
+REPO = Path(__file__).resolve().parent.parent
+
+WORDS = (
+    "the a my his her their it was is and but so because then when after before never always "
+    "reddit story friend work house car dog cat money time night morning school job boss parents "
+    "said told asked thought knew wanted found lost left called bought broke started stopped "
+    "really actually honestly literally probably completely suddenly finally quickly".split()
+)
+
+
+def default_config() -> dict:
+    """The settings a fresh install gets: the default (or the example) of every template entry."""
+
+    def defaults(node: dict) -> dict:
+        config = {}
+        for key, value in node.items():
+            if isinstance(value, dict) and not any(isinstance(v, dict) for v in value.values()):
+                config[key] = value.get("default", value.get("example", ""))
+            elif isinstance(value, dict):
+                config[key] = defaults(value)
+        return config
+
+    return defaults(toml.load(REPO / "utils" / ".config.template.toml"))
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words).capitalize()[:length].rstrip() + "."
+
+
+def paragraph(rng: random.Random, length: int) -> str:
+    sentences = []
+    while sum(len(text) + 1 for text in sentences) < length:
+        sentences.append(sentence(rng, rng.randint(40, 120)))
+    return " ".join(sentences)[:length].rstrip(" .") + "."
+
+
+def reddit_object(
+    comments: int = 20, comment_length: int = 200, storymode: bool = False, seed: int = 0
+) -> dict:
+    """A post shaped like the one reddit/subreddit.py returns.
+
+    Args:
+        comments (int): The number of comments, or of sentences of the post in story mode.
+        comment_length (int): The number of characters of every comment (or sentence).
+        storymode (bool): Whether the post text is split in sentences like for storymodemethod 1.
+        seed (int): The same seed always gives the same post.
+    """
+    rng = random.Random(seed)
+    thread_id = f"bench{comments}x{comment_length}{'s' if storymode else ''}"
+    return {
+        "thread_url": f"https://www.reddit.com/r/benchmark/comments/{thread_id}/",
+        "thread_title": sentence(rng, 80).rstrip(".") + "?",
+        "thread_id": thread_id,
+        "is_nsfw": False,
+        "thread_post": (
+            [sentence(rng, comment_length) for _ in range(comments)] if storymode else ""
+        ),
+        "comments": [
+            {
+                "comment_body": paragraph(rng, comment_length),
+                "comment_url": f"/r/benchmark/comments/{thread_id}/comment/c{idx}/",
+                "comment_id": f"c{idx}",
+            }
+            for idx in range(0 if storymode else comments)
+        ],
+    }
+
+
+def comment_cards(reddit_obj: dict, theme: str = "dark") -> None:
+    """Draws a card for the title and every comment, in place of the Playwright screenshots."""
+    reddit_id = reddit_obj["thread_id"]
+    directory = Path(f"assets/temp/{reddit_id}/png")
+    directory.mkdir(parents=True, exist_ok=True)
+    background, color = ((33, 33, 36), (240, 240, 240)) if theme == "dark" else ("white", "black")
+    font = ImageFont.truetype(str(REPO / "fonts" / "Roboto-Regular.ttf"), 28)
+    texts = [("title", reddit_obj["thread_title"])] + [
+        (f"comment_{idx}", comment["comment_body"])
+        for idx, comment in enumerate(reddit_obj["comments"])
+    ]
+    for name, text in texts:
+        lines = textwrap.wrap(text, width=48) or [""]
+        image = Image.new("RGB", (800, 60 + 36 * len(lines)), background)
+        draw = ImageDraw.Draw(image)
+        draw.text((30, 20), "u/benchmark", font=font, fill=(129, 131, 132))
+        for row, line in enumerate(lines):
+            draw.text((30, 56 + 36 * row), line, font=font, fill=color)
+        image.save(directory / f"{name}.png")
+
+
+def background_media(seconds: int, size: str = "1920x1080") -> Dict[str, Tuple]:
+    """Generates a test pattern video and a tone as the background, and returns their config.
+
+    The files are kept between runs and only made again when they are too short.
+    """
+    video = Path("assets/backgrounds/video/benchmark-background.mp4")
+    audio = Path("assets/backgrounds/audio/benchmark-background.mp3")
+    video.parent.mkdir(parents=True, exist_ok=True)
+    audio.parent.mkdir(parents=True, exist_ok=True)
+    length_file = video.with_suffix(".length")
+    if not length_file.exists() or int(length_file.read_text()) < seconds:
+        run = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i"]
+        subprocess.run(
+            run
+            + [
+                f"testsrc2=size={size}:rate=30:duration={seconds}",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "ultrafast",
+                "-pix_fmt",
+                "yuv420p",
+                str(video),
+            ],
+            check=True,
+        )
+        subprocess.run(
+            run + [f"sine=frequency=220:duration={seconds}", "-b:a", "128k", str(audio)],
+            check=True,
+        )
+        length_file.write_text(str(seconds))
+    return {
+        "video": ("", "background.mp4", "benchmark", "center"),
+        "audio": ("", "background.mp3", "benchmark"),
+    }
+
+
+@contextmanager
+def workspace(directory: str = None) -> Iterator[Path]:
+    """Runs the block in a scratch directory laid out like the repo (fonts, assets, videos.json),
+    so the benchmark never touches the real assets or results.
+
+    Import the modules of the bot before entering it, some of them read files at import time.
+
+    Args:
+        directory (str): Where to keep the scratch files, a temporary folder by default. Keeping it
+            saves making the background media again.
+    """
+    root = Path(directory or tempfile.mkdtemp(prefix="rvmb-benchmark-")).resolve()
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "assets").mkdir(exist_ok=True)
+    shutil.copy(REPO / "assets" / "title_template.png", root / "assets" / "title_template.png")
+    if not (root / "fonts").exists():
+        os.symlink(REPO / "fonts", root / "fonts", target_is_directory=True)
+    data = root / "video_creation" / "data"
+    data.mkdir(parents=True, exist_ok=True)
+    (data / "videos.json").write_text("[]")
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        yield root
+    finally:
+        os.chdir(cwd)
+        if directory is None:
+            shutil.rmtree(root, ignore_errors=True)
@@ -0,0 +1,201 @@
+"""Throughput benchmark of the HTTP TTS providers (TikTok and Streamlabs Polly).
+
+Runs a local stand-in for the two APIs, which answers after a fixed latency, and reads the same
+clips with the blocking requests client the providers used before (a new connection per request,
+one thread per clip in flight) and with the providers as they are now (one keep-alive pool, every
+clip in flight on the HTTP event loop thread). It reports clips per second and how many TCP
+connections the server had to accept.
+
+    python -m benchmarks.tts_http
+    python -m benchmarks.tts_http --clips 200 --in-flight 1 8 32 --latency 0.2 --json tts_http.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from rich.table import Table
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import default_config, workspace
+from utils import http_client, settings
+from utils.console import console, print_step
+
+settings.config = default_config()
+settings.config["settings"]["tts"]["streamlabs_polly_voice"] = "Matthew"
+
+from TTS.streamlabs_polly import StreamlabsPolly
+from TTS.TikTok import TikTok
+
+AUDIO = b"\xff\xfb\x90\x00" + bytes(4096)  # the size of a short clip, the content doesn't matter
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Answers like the TikTok and Streamlabs APIs, after server.latency seconds."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # or the body waits for the ack of the headers
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        if url.path.startswith("/tiktok"):
+            text = parse_qs(url.query)["req_text"][0]
+            body = {"status_code": 0, "data": {"v_str": base64.b64encode(AUDIO).decode()}}
+            body["message"] = text[:10]
+        else:
+            host = f"http://127.0.0.1:{self.server.server_port}"
+            body = {"speak_url": f"{host}/audio.mp3"}
+        self.reply(json.dumps(body).encode(), "application/json")
+
+    def do_GET(self):
+        time.sleep(self.server.latency / 4)  # a download from a CDN
+        self.reply(AUDIO, "audio/mpeg")
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # every clip in flight can open its connection at once
+
+
+def serve(latency: float) -> ThreadingHTTPServer:
+    server = StandInServer(("127.0.0.1", 0), StandIn)
+    server.latency = latency
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="stand-in", daemon=True).start()
+    return server
+
+
+def blocking_tiktok(url: str) -> Callable[[str, str], None]:
+    """The TikTok provider before, a blocking request on a requests.Session per provider."""
+    session = requests.Session()
+
+    def run(text: str, filepath: str) -> None:
+        params = {"req_text": text, "speaker_map_type": 0, "aid": 1233}
+        data = session.post(url, params=params).json()
+        with open(filepath, "wb") as out:
+            out.write(base64.b64decode(data["data"]["v_str"]))
+
+    return run
+
+
+def blocking_streamlabs(url: str) -> Callable[[str, str], None]:
+    """The Streamlabs provider before, a new connection for both requests of every clip."""
+
+    def run(text: str, filepath: str) -> None:
+        body = {"voice": "Matthew", "text": text, "service": "polly"}
+        response = requests.post(url, headers={"Referer": "https://streamlabs.com/"}, data=body)
+        voice_data = requests.get(response.json()["speak_url"])
+        with open(filepath, "wb") as f:
+            f.write(voice_data.content)
+
+    return run
+
+
+def blocking(run: Callable[[str, str], None], clips: int, in_flight: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=in_flight) as executor:
+        list(executor.map(lambda i: run(f"clip number {i}", f"blocking-{i}.mp3"), range(clips)))
+    return time.perf_counter() - start
+
+
+def pooled(provider, clips: int, in_flight: int) -> float:
+    async def read_all():
+        slots = asyncio.Semaphore(in_flight)
+
+        async def read(i: int):
+            async with slots:
+                await provider.arun(f"clip number {i}", f"pooled-{i}.mp3")
+
+        await asyncio.gather(*(read(i) for i in range(clips)))
+
+    http_client.close()  # start without the connections of the last point
+    start = time.perf_counter()
+    http_client.run(read_all())
+    return time.perf_counter() - start
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=100)
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds the API takes")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    server = serve(args.latency)
+    host = f"http://127.0.0.1:{server.server_port}"
+    tiktok, streamlabs = TikTok(), StreamlabsPolly()
+    tiktok.URI_BASE = f"{host}/tiktok/invoke/"
+    streamlabs.url = f"{host}/polly/speak"
+    clients = {
+        "TikTok": (blocking_tiktok(tiktok.URI_BASE), tiktok),
+        "StreamlabsPolly": (blocking_streamlabs(streamlabs.url), streamlabs),
+    }
+
+    points = []
+    with workspace():
+        for name, (before, provider) in clients.items():
+            for in_flight in args.in_flight:
+                print_step(f"{name}, {args.clips} clips, {in_flight} in flight")
+                point = {"provider": name, "in_flight": in_flight}
+                for client, read in (("blocking", blocking), ("pooled", pooled)):
+                    server.connections = 0
+                    seconds = read(
+                        before if client == "blocking" else provider, args.clips, in_flight
+                    )
+                    point[client] = {
+                        "clips_per_second": round(args.clips / seconds, 2),
+                        "connections": server.connections,
+                    }
+                points.append(point)
+    http_client.close()
+    server.shutdown()
+
+    table = Table(title=f"{args.clips} clips, {args.latency * 1000:g} ms API latency")
+    for column in ("provider", "in flight", "blocking clips/s", "pooled clips/s", "connections"):
+        table.add_column(column, justify="right")
+    for point in points:
+        table.add_row(
+            point["provider"],
+            str(point["in_flight"]),
+            f"{point['blocking']['clips_per_second']:.1f}",
+            f"{point['pooled']['clips_per_second']:.1f}",
+            f"{point['blocking']['connections']} / {point['pooled']['connections']}",
+        )
+    console.print(table)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "points": points}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
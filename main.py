@@ -1,20 +1,27 @@
 #!/usr/bin/env python
 import math
+import os
+import re
 import sys
-from os import name
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from subprocess import Popen
-from typing import NoReturn
+from typing import Deque, List, NoReturn, Optional
 
 from prawcore import ResponseException
 
 from reddit.subreddit import get_subreddit_threads
-from utils import settings
+from utils import metrics, settings
+from utils.checkpoint import StageManifest
 from utils.cleanup import cleanup
 from utils.console import print_markdown, print_step, print_substep
 from utils.ffmpeg_install import ffmpeg_install
+from utils.governor import RenderPool
 from utils.id import id
+from utils.pipeline import StagePipeline, stop_requested
 from utils.version import checkversion
+from utils.videos import in_progress
 from video_creation.background import (
     chop_background,
     download_background_audio,
@@ -27,58 +34,208 @@ from video_creation.voices import save_text_to_mp3
 
 __VERSION__ = "3.3.0"
 
-print(
+fetch_lock = threading.Lock()
+
+
+def ordinal(number: int) -> str:
+    if 10 <= number % 100 <= 20:
+        return f"{number}th"
+    return f"{number}{({1: 'st', 2: 'nd', 3: 'rd'}).get(number % 10, 'th')}"
+
+
+def prepare(POST_ID=None) -> dict:
+    """Fetches a post and runs every stage of its video except the final render.
+
+    Returns:
+        dict: The arguments of make_final_video for this post
     """
-██████╗ ███████╗██████╗ ██████╗ ██╗████████╗    ██╗   ██╗██╗██████╗ ███████╗ ██████╗     ███╗   ███╗ █████╗ ██╗  ██╗███████╗██████╗
-██╔══██╗██╔════╝██╔══██╗██╔══██╗██║╚══██╔══╝    ██║   ██║██║██╔══██╗██╔════╝██╔═══██╗    ████╗ ████║██╔══██╗██║ ██╔╝██╔════╝██╔══██╗
-██████╔╝█████╗  ██║  ██║██║  ██║██║   ██║       ██║   ██║██║██║  ██║█████╗  ██║   ██║    ██╔████╔██║███████║█████╔╝ █████╗  ██████╔╝
-██╔══██╗██╔══╝  ██║  ██║██║  ██║██║   ██║       ╚██╗ ██╔╝██║██║  ██║██╔══╝  ██║   ██║    ██║╚██╔╝██║██╔══██║██╔═██╗ ██╔══╝  ██╔══██╗
-██║  ██║███████╗██████╔╝██████╔╝██║   ██║        ╚████╔╝ ██║██████╔╝███████╗╚██████╔╝    ██║ ╚═╝ ██║██║  ██║██║  ██╗███████╗██║  ██║
-╚═╝  ╚═╝╚══════╝╚═════╝ ╚═════╝ ╚═╝   ╚═╝         ╚═══╝  ╚═╝╚═════╝ ╚══════╝ ╚═════╝     ╚═╝     ╚═╝╚═╝  ╚═╝╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝
-"""
-)
-print_markdown(
-    "### Thanks for using this tool! Feel free to contribute to this project on GitHub! If you have any questions, feel free to join my Discord server or submit a GitHub issue. You can find solutions to many common problems in the documentation: https://reddit-video-maker-bot.netlify.app/"
-)
-checkversion(__VERSION__)
+    global redditid
+    checkpoints = settings.config["settings"]["performance"]["checkpoints"]
+    with fetch_lock:  # so posts prepared at the same time never pick the same thread
+        manifest = None
+        if checkpoints and POST_ID:
+            manifest = StageManifest(re.sub(r"[^\w\s-]", "", POST_ID))
+        if manifest is not None and manifest.completed("reddit"):
+            print_substep("Resuming this post where the last run stopped.", style="bold blue")
+            reddit_obj = manifest.result("reddit")
+        else:
+            with metrics.measure(None, "reddit_fetch") as fetch:
+                reddit_obj = get_subreddit_threads(POST_ID)
+            metrics.add(re.sub(r"[^\w\s-]", "", reddit_obj["thread_id"]), fetch)
+            if checkpoints:
+                manifest = StageManifest(re.sub(r"[^\w\s-]", "", reddit_obj["thread_id"]))
+                manifest.record("reddit", reddit_obj, (), fetch["wall"])
+        redditid = id(reddit_obj)
+        in_progress.add(reddit_obj["thread_id"])
+    # The TTS, the screenshots and the background only share the reddit object,
+    # so they are scheduled as a dependency graph and run side by side.
+    pipeline = StagePipeline(
+        max_workers=None if settings.config["settings"]["performance"]["parallel_stages"] else 1,
+        manifest=manifest,
+        reddit_id=redditid,
+    )
+    pipeline.add(
+        "background_config",
+        lambda results: {
+            "video": get_background_config("video"),
+            "audio": get_background_config("audio"),
+        },
+    )
 
+    def read_post(results: dict) -> tuple:
+        length_and_comments = save_text_to_mp3(reddit_obj)
+        if manifest is not None:  # the TTS moves the comments which fit in the video to the front
+            manifest.update("reddit", reddit_obj)
+        return length_and_comments
 
-def main(POST_ID=None) -> None:
-    global redditid, reddit_object
-    reddit_object = get_subreddit_threads(POST_ID)
-    redditid = id(reddit_object)
-    length, number_of_comments = save_text_to_mp3(reddit_object)
-    length = math.ceil(length)
-    get_screenshots_of_reddit_posts(reddit_object, number_of_comments)
-    bg_config = {
-        "video": get_background_config("video"),
-        "audio": get_background_config("audio"),
+    pipeline.add("tts", read_post, outputs=["mp3/*.mp3", "mp3/durations.json"])
+    pipeline.add(
+        "background_video",
+        lambda results: download_background_video(results["background_config"]["video"]),
+        requires=["background_config"],
+        checkpoint=False,
+    )
+    pipeline.add(
+        "background_audio",
+        lambda results: download_background_audio(results["background_config"]["audio"]),
+        requires=["background_config"],
+        checkpoint=False,
+    )
+    pipeline.add(
+        "screenshots",
+        lambda results: get_screenshots_of_reddit_posts(reddit_obj, results["tts"][1]),
+        requires=["tts"],
+        outputs=["png/title.png", "png/comment_*.png", "png/story_content.png", "png/img*.png"],
+    )
+    pipeline.add(
+        "chop_background",
+        lambda results: chop_background(
+            results["background_config"], math.ceil(results["tts"][0]), reddit_obj
+        ),
+        requires=["background_config", "tts", "background_video", "background_audio"],
+        outputs=["background.mp4", "background.mp3"],
+    )
+    results = pipeline.run()
+    length, number_of_comments = results["tts"]
+    return {
+        "number_of_clips": number_of_comments,
+        "length": math.ceil(length),
+        "reddit_obj": reddit_obj,
+        "background_config": results["background_config"],
     }
-    download_background_video(bg_config["video"])
-    download_background_audio(bg_config["audio"])
-    chop_background(bg_config, length, reddit_object)
-    make_final_video(number_of_comments, length, reddit_object, bg_config)
+
+
+def finish(job: dict, path: str) -> None:
+    """Forgets about a post once its video is done
+
+    Args:
+        job (dict): The post, as returned by prepare()
+        path (str): Where the video was saved
+    """
+    reddit_id = re.sub(r"[^\w\s-]", "", job["reddit_obj"]["thread_id"])
+    in_progress.discard(job["reddit_obj"]["thread_id"])
+    StageManifest(reddit_id).discard()
+    stages = metrics.pop(reddit_id)
+    if settings.config["settings"]["performance"]["stage_metrics"]:
+        metrics_path = f"{os.path.splitext(path)[0]}.metrics.json"
+        metrics.write(reddit_id, stages, metrics_path)
+        print_substep(f"Saved the stage metrics to {metrics_path}")
+    if settings.config["settings"]["performance"]["trace"]:
+        trace_path = f"{os.path.splitext(path)[0]}.trace.json"
+        metrics.write_trace(reddit_id, stages, trace_path)
+        print_substep(f"Saved the trace of the build to {trace_path}")
+
+
+def render(job: dict) -> None:
+    """Renders a post prepared by prepare()"""
+    finish(job, make_final_video(**job))
+
+
+def main(POST_ID=None) -> None:
+    render(prepare(POST_ID))
+
+
+def run_batch(post_ids: List[Optional[str]], noun: str = "post") -> None:
+    """Makes a video for every post id, None picks a new post from the subreddit.
+
+    The next posts are prepared while the current one renders, so their fetch, TTS and screenshots
+    overlap with the ffmpeg encode. settings.performance.batch_prefetch sets how many posts are
+    prepared ahead. With settings.performance.render_processes above 1, that many posts are rendered
+    at the same time in worker processes which share the cores. When a post fails or the run is
+    interrupted, the posts being prepared stop at their next step and are waited for, so their temp
+    files can be cleared.
+    """
+    prefetch = settings.config["settings"]["performance"]["batch_prefetch"]
+    processes = settings.config["settings"]["performance"]["render_processes"]
+    executor = ThreadPoolExecutor(max_workers=max(prefetch, 1), thread_name_prefix="post")
+    render_pool = RenderPool(processes) if processes > 1 and len(post_ids) > 1 else None
+    prepared: Deque[Future] = deque()
+    try:
+        for index in range(len(post_ids)):
+            while len(prepared) <= prefetch and index + len(prepared) < len(post_ids):
+                prepared.append(executor.submit(prepare, post_ids[index + len(prepared)]))
+            print_step(f"on the {ordinal(index + 1)} {noun} of {len(post_ids)}")
+            job = prepared.popleft().result()
+            if render_pool is None:
+                render(job)
+                continue
+            render_pool.submit(len(post_ids) - index, make_final_video, **job).add_done_callback(
+                lambda future, job=job: not future.cancelled()
+                and future.exception() is None
+                and finish(job, future.result())
+            )
+        if render_pool is not None:
+            render_pool.join()
+    except BaseException:
+        stop_requested.set()
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if render_pool is not None:
+            render_pool.shutdown()
 
 
 def run_many(times) -> None:
-    for x in range(1, times + 1):
-        print_step(
-            f'on the {x}{("th", "st", "nd", "rd", "th", "th", "th", "th", "th", "th")[x % 10]} iteration of {times}'
-        )  # correct 1st 2nd 3rd 4th 5th....
-        main()
-        Popen("cls" if name == "nt" else "clear", shell=True).wait()
+    run_batch([None] * times, noun="iteration")
 
 
-def shutdown() -> NoReturn:
+def shutdown(interrupted: bool = False) -> NoReturn:
+    """Clears the temp files of the posts in progress and exits.
+
+    Args:
+        interrupted (bool): Whether the run was stopped with Ctrl-C. With checkpoints on, the temp
+            files and their manifest are kept, so the next run with the same post resumes it.
+    """
+    reddit_ids = set(in_progress)
     if "redditid" in globals():
+        reddit_ids.add(redditid)
+    if interrupted and settings.config["settings"]["performance"]["checkpoints"]:
+        if reddit_ids:
+            print_substep("Kept the temp files, run the same post again to resume it.")
+    elif reddit_ids:
         print_markdown("## Clearing temp files")
-        cleanup(redditid)
+        for reddit_id in reddit_ids:
+            cleanup(reddit_id)
 
     print("Exiting...")
     sys.exit()
 
 
 if __name__ == "__main__":
+    print(
+        """
+██████╗ ███████╗██████╗ ██████╗ ██╗████████╗    ██╗   ██╗██╗██████╗ ███████╗ ██████╗     ███╗   ███╗ █████╗ ██╗  ██╗███████╗██████╗
+██╔══██╗██╔════╝██╔══██╗██╔══██╗██║╚══██╔══╝    ██║   ██║██║██╔══██╗██╔════╝██╔═══██╗    ████╗ ████║██╔══██╗██║ ██╔╝██╔════╝██╔══██╗
+██████╔╝█████╗  ██║  ██║██║  ██║██║   ██║       ██║   ██║██║██║  ██║█████╗  ██║   ██║    ██╔████╔██║███████║█████╔╝ █████╗  ██████╔╝
+██╔══██╗██╔══╝  ██║  ██║██║  ██║██║   ██║       ╚██╗ ██╔╝██║██║  ██║██╔══╝  ██║   ██║    ██║╚██╔╝██║██╔══██║██╔═██╗ ██╔══╝  ██╔══██╗
+██║  ██║███████╗██████╔╝██████╔╝██║   ██║        ╚████╔╝ ██║██████╔╝███████╗╚██████╔╝    ██║ ╚═╝ ██║██║  ██║██║  ██╗███████╗██║  ██║
+╚═╝  ╚═╝╚══════╝╚═════╝ ╚═════╝ ╚═╝   ╚═╝         ╚═══╝  ╚═╝╚═════╝ ╚══════╝ ╚═════╝     ╚═╝     ╚═╝╚═╝  ╚═╝╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝
+"""
+    )
+    print_markdown(
+        "### Thanks for using this tool! Feel free to contribute to this project on GitHub! If you have any questions, feel free to join my Discord server or submit a GitHub issue. You can find solutions to many common problems in the documentation: https://reddit-video-maker-bot.netlify.app/"
+    )
+    checkversion(__VERSION__)
     if sys.version_info.major != 3 or sys.version_info.minor not in [10, 11]:
         print(
             "Hey! Congratulations, you've made it so far (which is pretty rare with no Python 3.10). Unfortunately, this program only works on Python 3.10. Please install Python 3.10 and try again."
@@ -102,19 +259,13 @@ if __name__ == "__main__":
         sys.exit()
     try:
         if config["reddit"]["thread"]["post_id"]:
-            for index, post_id in enumerate(config["reddit"]["thread"]["post_id"].split("+")):
-                index += 1
-                print_step(
-                    f'on the {index}{("st" if index % 10 == 1 else ("nd" if index % 10 == 2 else ("rd" if index % 10 == 3 else "th")))} post of {len(config["reddit"]["thread"]["post_id"].split("+"))}'
-                )
-                main(post_id)
-                Popen("cls" if name == "nt" else "clear", shell=True).wait()
+            run_batch(config["reddit"]["thread"]["post_id"].split("+"))
         elif config["settings"]["times_to_run"]:
             run_many(config["settings"]["times_to_run"])
         else:
             main()
     except KeyboardInterrupt:
-        shutdown()
+        shutdown(interrupted=True)
     except ResponseException:
         print_markdown("## Invalid credentials")
         print_markdown("Please check your credentials in the config.toml file")
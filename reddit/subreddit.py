@@ -4,10 +4,8 @@ import praw
 from praw.models import MoreComments
 from prawcore.exceptions import ResponseException
 
-from utils import settings
-from utils.ai_methods import sort_by_similarity
+from utils import metrics, settings
 from utils.console import print_step, print_substep
-from utils.posttextparser import posttextparser
 from utils.subreddit import get_subreddit_undone
 from utils.videos import check_done
 from utils.voice import sanitize_text
@@ -106,6 +104,10 @@ def get_subreddit_threads(POST_ID: str):
         # Reformat the keywords for printing
         keywords_print = ", ".join(keywords)
         print(f"Sorting threads by similarity to the given keywords: {keywords_print}")
+        from utils.ai_methods import (
+            sort_by_similarity,  # torch and transformers take a while
+        )
+
         threads, similarity_scores = sort_by_similarity(threads, keywords)
         submission, similarity_score = get_subreddit_undone(
             threads, subreddit, similarity_scores=similarity_scores
@@ -146,37 +148,40 @@ def get_subreddit_threads(POST_ID: str):
     content["comments"] = []
     if settings.config["settings"]["storymode"]:
         if settings.config["settings"]["storymodemethod"] == 1:
+            from utils.posttextparser import posttextparser  # loads spacy
+
             content["thread_post"] = posttextparser(submission.selftext)
         else:
             content["thread_post"] = submission.selftext
     else:
-        for top_level_comment in submission.comments:
-            if isinstance(top_level_comment, MoreComments):
-                continue
-
-            if top_level_comment.body in ["[removed]", "[deleted]"]:
-                continue  # # see https://github.com/JasonLovesDoggo/RedditVideoMakerBot/issues/78
-            if not top_level_comment.stickied:
-                sanitised = sanitize_text(top_level_comment.body)
-                if not sanitised or sanitised == " ":
+        with metrics.measure(re.sub(r"[^\w\s-]", "", submission.id), "comment_filtering"):
+            for top_level_comment in submission.comments:
+                if isinstance(top_level_comment, MoreComments):
                     continue
-                if len(top_level_comment.body) <= int(
-                    settings.config["reddit"]["thread"]["max_comment_length"]
-                ):
-                    if len(top_level_comment.body) >= int(
-                        settings.config["reddit"]["thread"]["min_comment_length"]
+
+                if top_level_comment.body in ["[removed]", "[deleted]"]:
+                    continue  # # see https://github.com/JasonLovesDoggo/RedditVideoMakerBot/issues/78
+                if not top_level_comment.stickied:
+                    sanitised = sanitize_text(top_level_comment.body)
+                    if not sanitised or sanitised == " ":
+                        continue
+                    if len(top_level_comment.body) <= int(
+                        settings.config["reddit"]["thread"]["max_comment_length"]
                     ):
-                        if (
-                            top_level_comment.author is not None
-                            and sanitize_text(top_level_comment.body) is not None
-                        ):  # if errors occur with this change to if not.
-                            content["comments"].append(
-                                {
-                                    "comment_body": top_level_comment.body,
-                                    "comment_url": top_level_comment.permalink,
-                                    "comment_id": top_level_comment.id,
-                                }
-                            )
+                        if len(top_level_comment.body) >= int(
+                            settings.config["reddit"]["thread"]["min_comment_length"]
+                        ):
+                            if (
+                                top_level_comment.author is not None
+                                and sanitize_text(top_level_comment.body) is not None
+                            ):  # if errors occur with this change to if not.
+                                content["comments"].append(
+                                    {
+                                        "comment_body": top_level_comment.body,
+                                        "comment_url": top_level_comment.permalink,
+                                        "comment_id": top_level_comment.id,
+                                    }
+                                )
 
     print_substep("Received subreddit threads Successfully.", style="bold green")
     return content
@@ -0,0 +1,138 @@
+"""Reads the duration of the TTS audio from the file headers, without starting ffmpeg."""
+
+import json
+import os
+import struct
+from typing import Dict, Optional
+
+__all__ = ["audio_duration", "mp3_duration", "wav_duration", "load_durations", "save_durations"]
+
+# kbps by [MPEG-1?][layer] and bitrate index
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# Hz by version bits (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1) and sample rate index
+_SAMPLE_RATES = {0: [11025, 12000, 8000], 2: [22050, 24000, 16000], 3: [44100, 48000, 32000]}
+
+
+def _frame(data: bytes, offset: int) -> Optional[tuple]:
+    """Parses the MP3 frame header at offset.
+
+    Returns:
+        Optional[tuple]: (frame length in bytes, samples in the frame, sample rate), None if there is
+            no valid header there
+    """
+    if offset + 4 > len(data) or data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[offset + 1] >> 3) & 0b11
+    layer = 4 - ((data[offset + 1] >> 1) & 0b11)
+    bitrate_index = data[offset + 2] >> 4
+    rate_index = (data[offset + 2] >> 2) & 0b11
+    padding = (data[offset + 2] >> 1) & 1
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None  # reserved values, or free format which can't be measured from the header
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if layer == 2 or mpeg1 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+
+def _xing_frames(data: bytes, offset: int, samples: int) -> Optional[int]:
+    """The number of frames of a VBR file, from the Xing/Info or VBRI header of its first frame."""
+    mpeg1 = samples == 1152
+    mono = (data[offset + 3] >> 6) == 0b11
+    xing = offset + 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17))
+    if data[xing : xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4 : xing + 8])[0]
+        if flags & 1:
+            return struct.unpack(">I", data[xing + 8 : xing + 12])[0]
+    vbri = offset + 4 + 32
+    if data[vbri : vbri + 4] == b"VBRI":
+        return struct.unpack(">I", data[vbri + 14 : vbri + 18])[0]
+    return None
+
+
+def mp3_duration(data: bytes) -> Optional[float]:
+    """The duration in seconds of MP3 data, from the frame headers."""
+    offset = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        offset = 10 + size + (10 if data[5] & 0x10 else 0)
+    # find the first frame, there can be some junk after the tag
+    while offset < len(data) - 4 and _frame(data, offset) is None:
+        offset += 1
+    first = _frame(data, offset)
+    if first is None:
+        return None
+    frames = _xing_frames(data, offset, first[1])
+    if frames is not None:
+        return frames * first[1] / first[2]
+
+    samples = 0
+    while True:
+        frame = _frame(data, offset)
+        if frame is None or frame[0] <= 0:
+            break
+        samples += frame[1]
+        offset += frame[0]
+    return samples / first[2]
+
+
+def wav_duration(data: bytes) -> Optional[float]:
+    """The duration in seconds of WAV data, from its fmt and data chunks."""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    offset = 12
+    byte_rate = None
+    while offset + 8 <= len(data):
+        chunk = data[offset : offset + 4]
+        size = struct.unpack("<I", data[offset + 4 : offset + 8])[0]
+        if chunk == b"fmt ":
+            byte_rate = struct.unpack("<I", data[offset + 16 : offset + 20])[0]
+        elif chunk == b"data" and byte_rate:
+            # some writers leave the size of a streamed file at 0 or 0xFFFFFFFF
+            if size in (0, 0xFFFFFFFF):
+                size = len(data) - offset - 8
+            return min(size, len(data) - offset - 8) / byte_rate
+        offset += 8 + size + (size & 1)
+    return None
+
+
+def audio_duration(path: str) -> Optional[float]:
+    """The duration in seconds of an MP3 or WAV file, whatever its extension.
+
+    Returns:
+        Optional[float]: None if the format isn't recognised, the caller can fall back to ffprobe
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if data[:4] == b"RIFF":
+        return wav_duration(data)
+    return mp3_duration(data)
+
+
+def load_durations(directory: str) -> Dict[str, float]:
+    """The durations index of a folder of TTS audio, by file name without extension."""
+    try:
+        with open(os.path.join(directory, "durations.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_durations(directory: str, durations: Dict[str, float]) -> None:
+    temp_path = os.path.join(directory, "durations.json.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(durations, f, indent=4, sort_keys=True)
+    os.replace(temp_path, os.path.join(directory, "durations.json"))
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+__all__ = ["StageManifest"]
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageManifest:
+    """Keeps track of the finished stages of a post in assets/temp/<reddit_id>/manifest.json
+
+    For every stage it records the result, the output files with their sha256 and how long it took,
+    so a restart with the same post can skip the stages which are already done.
+
+    Args:
+        reddit_id (str): The (sanitized) id of the post.
+    """
+
+    def __init__(self, reddit_id: str):
+        self.directory = Path(f"assets/temp/{reddit_id}")
+        self.path = self.directory / "manifest.json"
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.stages: Dict[str, dict] = json.load(f)["stages"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self.stages = {}
+
+    def completed(self, name: str) -> bool:
+        """Whether the stage is done and all of its output files are still the same."""
+        stage = self.stages.get(name)
+        if stage is None:
+            return False
+        for output, digest in stage["outputs"].items():
+            path = self.directory / output
+            if not path.is_file() or file_hash(path) != digest:
+                return False
+        return True
+
+    def result(self, name: str) -> Any:
+        return self.stages[name]["result"]
+
+    def record(self, name: str, result: Any, outputs: Iterable[str], duration: float) -> None:
+        """Marks a stage as done.
+
+        Args:
+            name (str): The name of the stage.
+            result (Any): What the stage returned, it's given back by result() on a restart.
+            outputs (Iterable[str]): Glob patterns of the files the stage made, relative to the
+                temp folder of the post.
+            duration (float): How long the stage took in seconds.
+        """
+        files: List[Path] = sorted(
+            {path for pattern in outputs for path in self.directory.glob(pattern) if path.is_file()}
+        )
+        with self.lock:
+            self.stages[name] = {
+                "result": result,
+                "outputs": {
+                    path.relative_to(self.directory).as_posix(): file_hash(path) for path in files
+                },
+                "duration": round(duration, 3),
+                "finished": int(time.time()),
+            }
+            self.save()
+
+    def update(self, name: str, result: Any) -> None:
+        """Replaces the result of a finished stage, e.g. the post once its comments were reordered."""
+        with self.lock:
+            if name in self.stages:
+                self.stages[name]["result"] = result
+                self.save()
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            # results which can't be stored become null
+            json.dump({"stages": self.stages}, f, indent=4, default=lambda _: None)
+        os.replace(temp_path, self.path)
+
+    def discard(self) -> None:
+        """Forgets every stage, once the video is done."""
+        with self.lock:
+            self.stages = {}
+            if self.path.exists():
+                self.path.unlink()
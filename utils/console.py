@@ -1,14 +1,22 @@
 import re
+import threading
+from typing import Iterable, Iterator, TypeVar
 
 from rich.columns import Columns
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.padding import Padding
 from rich.panel import Panel
+from rich.progress import track as rich_track
 from rich.text import Text
 
 console = Console()
 
+T = TypeVar("T")
+
+# rich can only show one live display at a time, see track()
+_live_display = threading.Lock()
+
 
 def print_markdown(text) -> None:
     """Prints a rich info message. Support Markdown syntax."""
@@ -35,6 +43,21 @@ def print_substep(text, style="") -> None:
     console.print(text, style=style)
 
 
+def track(sequence: Iterable[T], description: str = "Working...") -> Iterator[T]:
+    """Shows a progress bar while iterating over the sequence.
+
+    Stages and posts can run at the same time, but rich only supports one live display. If another
+    progress bar is already shown, the sequence is iterated without one.
+    """
+    if not _live_display.acquire(blocking=False):
+        yield from sequence
+        return
+    try:
+        yield from rich_track(sequence, description)
+    finally:
+        _live_display.release()
+
+
 def handle_input(
     message: str = "",
     check_type=False,
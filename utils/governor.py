@@ -0,0 +1,154 @@
+import multiprocessing
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    CancelledError,
+    Future,
+    ProcessPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from utils import metrics, settings, videos
+
+# Threads given to the ffmpeg encodes of this process. Set in the render workers by the governor.
+_threads: Optional[int] = None
+
+
+def thread_budget() -> int:
+    """How many cores the renders may use in total, settings.performance.render_threads (0 = every core)"""
+    return (
+        settings.config["settings"]["performance"]["render_threads"] or multiprocessing.cpu_count()
+    )
+
+
+def ffmpeg_threads() -> int:
+    """The value of the ffmpeg "threads" option for the encodes of this process."""
+    if _threads is not None:
+        return _threads
+    per_job = settings.config["settings"]["performance"]["render_threads_per_job"]
+    return min(thread_budget(), per_job) if per_job else thread_budget()
+
+
+class CpuGovernor:
+    """Splits a budget of cores between the encodes that run at the same time.
+
+    Args:
+        total (int): The number of cores all the encodes may use together.
+        per_job (int): The most cores a single encode gets, 0 for no cap.
+        slots (int): How many encodes can run at the same time.
+    """
+
+    def __init__(self, total: int, per_job: int, slots: int):
+        self.total = total
+        self.per_job = per_job
+        self.slots = slots
+        self.in_use = 0
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, remaining_jobs: int) -> int:
+        """Reserves cores for a new encode.
+
+        Args:
+            remaining_jobs (int): The encodes still to start, including this one. At the end of a batch
+                fewer encodes share the cores, so each of them gets more.
+
+        Returns:
+            int: The number of threads the encode may use
+        """
+        with self.lock:
+            sharing = max(1, min(self.slots - self.active, remaining_jobs))
+            threads = max(1, (self.total - self.in_use) // sharing)
+            if self.per_job:
+                threads = min(threads, self.per_job)
+            self.in_use += threads
+            self.active += 1
+            return threads
+
+    def release(self, threads: int) -> None:
+        with self.lock:
+            self.in_use -= threads
+            self.active -= 1
+
+
+def _init_worker(config: dict, videos_lock) -> None:
+    settings.config = config
+    videos.videos_lock = videos_lock
+
+
+def _run_with_threads(threads: int, func: Callable, *args, **kwargs) -> Tuple[Any, dict]:
+    global _threads
+    _threads = threads
+    return func(*args, **kwargs), metrics.collect()
+
+
+def _unwrap(inner: Future, outer: Future) -> None:
+    """Resolves the future given to the caller with the result of the worker, and keeps its metrics."""
+    if inner.cancelled():
+        outer.set_exception(CancelledError())
+    elif inner.exception() is not None:
+        outer.set_exception(inner.exception())
+    else:
+        result, records = inner.result()
+        metrics.merge(records)
+        outer.set_result(result)
+
+
+class RenderPool:
+    """Renders several videos at the same time in worker processes.
+
+    Args:
+        processes (int): How many videos are rendered at the same time.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self.governor = CpuGovernor(
+            total=thread_budget(),
+            per_job=settings.config["settings"]["performance"]["render_threads_per_job"],
+            slots=processes,
+        )
+        # spawn instead of fork, the parent is running the stages of the next posts in threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(settings.config, videos.videos_lock),
+        )
+        self.running: Dict[Future, int] = {}
+
+    def reap(self, block: bool) -> None:
+        """Collects the finished renders and raises the first error of one of them."""
+        if not self.running:
+            return
+        finished, _ = wait(self.running, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in finished:
+            self.governor.release(self.running.pop(future))
+        for future in finished:
+            future.result()
+
+    def submit(self, remaining_jobs: int, func: Callable, *args, **kwargs) -> Future:
+        """Starts func(*args, **kwargs) in a worker once one is free.
+
+        Args:
+            remaining_jobs (int): The renders still to start, including this one.
+        """
+        self.reap(block=False)
+        while len(self.running) >= self.processes:
+            self.reap(block=True)
+        threads = self.governor.acquire(remaining_jobs)
+        future = self.executor.submit(_run_with_threads, threads, func, *args, **kwargs)
+        self.running[future] = threads
+        result = Future()
+        result.set_running_or_notify_cancel()
+        future.add_done_callback(lambda inner: _unwrap(inner, result))
+        return result
+
+    def join(self) -> None:
+        """Waits for every render to finish."""
+        while self.running:
+            self.reap(block=True)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=not self.running, cancel_futures=True)
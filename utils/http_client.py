@@ -0,0 +1,89 @@
+import asyncio
+import atexit
+import os
+import threading
+from typing import Any, Coroutine, Dict, Optional
+
+import aiohttp
+
+__all__ = ["event_loop", "run", "session"]
+
+CONNECT_TIMEOUT = 10  # seconds to open a connection
+READ_TIMEOUT = 60  # seconds without a byte from the server
+MAX_CONNECTIONS = 32  # open at the same time, to every host together
+KEEPALIVE_TIMEOUT = 30  # seconds an idle connection is kept for the next request
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_connector: Optional[aiohttp.TCPConnector] = None
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+_lock = threading.Lock()
+
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    """The event loop of the HTTP requests of the TTS providers, running on its own thread.
+
+    Every request of every TTSEngine worker is made on it, so the clips in flight share one thread
+    and one pool of keep-alive connections.
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="http", daemon=True).start()
+            atexit.register(close)
+        return _loop
+
+
+def run(coroutine: Coroutine) -> Any:
+    """Runs the coroutine on the HTTP event loop and waits for its result, from any other thread."""
+    return asyncio.run_coroutine_threadsafe(coroutine, event_loop()).result()
+
+
+def session(name: str = "") -> aiohttp.ClientSession:
+    """The session shared by the providers. Only use it in coroutines running on event_loop().
+
+    Args:
+        name (str): Sessions with another name keep their own cookies, e.g. one per account of a
+            provider, but they share the connections of the default one.
+    """
+    global _connector
+    if _connector is None or _connector.closed:
+        _connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, keepalive_timeout=KEEPALIVE_TIMEOUT)
+        _sessions.clear()
+    if name not in _sessions or _sessions[name].closed:
+        _sessions[name] = aiohttp.ClientSession(
+            connector=_connector,
+            connector_owner=False,
+            timeout=aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT),
+        )
+    return _sessions[name]
+
+
+async def _close_sessions() -> None:
+    for client_session in _sessions.values():
+        await client_session.close()
+    _sessions.clear()
+    if _connector is not None:
+        await _connector.close()
+
+
+def close() -> None:
+    """Closes the connections and stops the event loop."""
+    global _loop, _connector
+    with _lock:
+        if _loop is None:
+            return
+        if _sessions or _connector is not None:
+            asyncio.run_coroutine_threadsafe(_close_sessions(), _loop).result(timeout=5)
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop = _connector = None
+
+
+def _forget() -> None:
+    # a forked process (e.g. a render worker) doesn't have the thread of the loop
+    global _loop, _connector
+    _loop = _connector = None
+    _sessions.clear()
+
+
+os.register_at_fork(after_in_child=_forget)
@@ -3,10 +3,11 @@ import re
 import textwrap
 
 from PIL import Image, ImageDraw, ImageFont
-from rich.progress import track
 
 from TTS.engine_wrapper import process_text
+from utils.console import track
 from utils.fonts import getheight, getsize
+from utils.profiling import profiled
 
 
 def draw_multiple_line_text(
@@ -53,6 +54,7 @@ def draw_multiple_line_text(
         y += line_height + padding
 
 
+@profiled("imagemaker")
 def imagemaker(theme, reddit_obj: dict, txtclr, padding=5, transparent=False) -> None:
     """
     Render Images for video
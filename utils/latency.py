@@ -0,0 +1,79 @@
+import bisect
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+__all__ = ["LatencyHistograms", "latency_histograms"]
+
+# upper bounds in seconds of the buckets, 20% apart from 50 ms to about 3 minutes
+BOUNDS: List[float] = [round(0.05 * 1.2**i, 4) for i in range(46)]
+MIN_SAMPLES = 20  # below that, the quantiles aren't trusted
+MAX_SAMPLES = 5000  # past that the counts are halved, so the old requests weigh less and less
+
+
+class LatencyHistograms:
+    """How long the requests to every TTS provider take, in assets/cache/tts_latency.json
+
+    Every provider has a histogram with logarithmic buckets. The p95 of a provider is the deadline
+    after which TTSEngine sends a hedged request to the next provider of the failover chain.
+
+    Args:
+        path (str): The json file the histograms are kept in.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.histograms: Dict[str, List[int]] = {
+                    provider: counts
+                    for provider, counts in json.load(f)["histograms"].items()
+                    if len(counts) == len(BOUNDS) + 1
+                }
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self.histograms = {}
+
+    def record(self, provider: str, seconds: float) -> None:
+        with self.lock:
+            counts = self.histograms.setdefault(provider, [0] * (len(BOUNDS) + 1))
+            counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+            if sum(counts) > MAX_SAMPLES:
+                self.histograms[provider] = [count // 2 for count in counts]
+
+    def quantile(self, provider: str, q: float) -> Optional[float]:
+        """The upper bound of the bucket of the q quantile, None with too few requests to tell."""
+        with self.lock:
+            counts = self.histograms.get(provider)
+            total = sum(counts) if counts else 0
+            if total < MIN_SAMPLES:
+                return None
+            seen = 0
+            for index, count in enumerate(counts):
+                seen += count
+                if seen >= q * total:
+                    return BOUNDS[min(index, len(BOUNDS) - 1)]
+        return BOUNDS[-1]
+
+    def save(self) -> None:
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"bounds": BOUNDS, "histograms": self.histograms}, f)
+            os.replace(temp_path, self.path)
+
+
+_histograms: Optional[LatencyHistograms] = None
+_histograms_lock = threading.Lock()
+
+
+def latency_histograms() -> LatencyHistograms:
+    """The latency histograms shared by every TTSEngine."""
+    global _histograms
+    with _histograms_lock:
+        if _histograms is None:
+            _histograms = LatencyHistograms("assets/cache/tts_latency.json")
+        return _histograms
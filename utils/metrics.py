@@ -0,0 +1,242 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+__all__ = ["measure", "count", "inherit", "add", "collect", "merge", "pop", "write", "write_trace"]
+
+T = TypeVar("T")
+
+_records: Dict[str, List[dict]] = defaultdict(list)
+_lock = threading.Lock()
+_active = threading.local()
+
+
+def _peak_rss(who: int) -> Optional[int]:
+    """Peak resident set size in bytes of this process or of its finished child processes, since
+    the process started."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports kilobytes
+
+
+def _rss() -> Optional[int]:
+    """Resident set size in bytes of this process right now, where /proc is available."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _children_cpu() -> Optional[float]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _size(path: str) -> int:
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    if path.is_dir():
+        return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+    return 0
+
+
+def _stack() -> List[dict]:
+    if not hasattr(_active, "stack"):
+        _active.stack = []
+    return _active.stack
+
+
+@contextmanager
+def measure(reddit_id: Optional[str], name: str, outputs: Iterable[str] = ()) -> Iterator[dict]:
+    """Measures a stage of a video.
+
+    Records the wall time, the CPU time of the thread and of the jobs it handed to other threads
+    with inherit(), the CPU time of the child processes (ffmpeg)
+    which finished meanwhile, the RSS at the end of the stage, the size of the outputs and the
+    external calls counted with count() while the stage runs. process_peak_rss and
+    children_peak_rss are the peaks since the process started, they only grow from a stage to the
+    next one.
+
+    Args:
+        reddit_id (Optional[str]): The video the stage belongs to. With None the record is only
+            yielded, and can be added once the id is known with add().
+        name (str): The name of the stage.
+        outputs (Iterable[str]): Files or folders the stage writes, for the bytes written.
+    """
+    record = {
+        "stage": name,
+        "start": time.time(),
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+        "tid": threading.get_ident(),
+        "depth": len(_stack()),
+        "calls": {},
+    }
+    children_cpu = _children_cpu()
+    start_cpu = time.thread_time()
+    start = time.perf_counter()
+    _stack().append(record)
+    try:
+        yield record
+    finally:
+        _stack().pop()
+        with _lock:  # the jobs of other threads stop adding their CPU time once the stage is done
+            record["wall"] = round(time.perf_counter() - start, 4)
+            threads_cpu = record.pop("threads_cpu", 0.0)
+        record["cpu"] = round(time.thread_time() - start_cpu + threads_cpu, 4)
+        record["children_cpu"] = (
+            round(_children_cpu() - children_cpu, 4) if children_cpu is not None else None
+        )
+        record["rss"] = _rss()
+        record["process_peak_rss"] = _peak_rss(resource.RUSAGE_SELF) if resource else None
+        record["children_peak_rss"] = _peak_rss(resource.RUSAGE_CHILDREN) if resource else None
+        record["bytes_written"] = sum(_size(output) for output in outputs)
+        if reddit_id is not None:
+            add(reddit_id, record)
+
+
+def count(kind: str, amount: int = 1) -> None:
+    """Counts an external call (TTS request, ffmpeg run...) in the stages measured by this thread."""
+    with _lock:  # the jobs of several threads count in the same stages
+        for record in _stack():
+            record["calls"][kind] = record["calls"].get(kind, 0) + amount
+
+
+def inherit(job: Callable[..., T]) -> Callable[..., T]:
+    """Wraps a job to run on another thread as a part of the stages this thread is measuring.
+
+    The records of the job are nested in the stages, its calls are counted in them and its CPU time
+    is added to theirs, e.g. the TTS requests of the worker threads belong to the tts stage.
+    """
+    parents = list(_stack())
+
+    def run(*args, **kwargs) -> T:
+        stack = _stack()
+        saved = stack[:]
+        stack[:] = parents
+        start_cpu = time.thread_time()
+        try:
+            return job(*args, **kwargs)
+        finally:
+            cpu = time.thread_time() - start_cpu
+            stack[:] = saved
+            with _lock:
+                for record in parents:
+                    if "wall" not in record:  # still running
+                        record["threads_cpu"] = record.get("threads_cpu", 0.0) + cpu
+
+    return run
+
+
+def add(reddit_id: str, record: dict) -> None:
+    with _lock:
+        _records[reddit_id].append(record)
+
+
+def collect() -> Dict[str, List[dict]]:
+    """Removes and returns every record of this process, to send them from a render worker back."""
+    with _lock:
+        records = dict(_records)
+        _records.clear()
+    return records
+
+
+def merge(records: Dict[str, List[dict]]) -> None:
+    with _lock:
+        for reddit_id, stages in records.items():
+            _records[reddit_id].extend(stages)
+
+
+def pop(reddit_id: str) -> List[dict]:
+    """Removes and returns the records of a video, sorted by start time."""
+    with _lock:
+        return sorted(_records.pop(reddit_id, []), key=lambda record: record["start"])
+
+
+def write(reddit_id: str, stages: List[dict], path: str) -> None:
+    """Writes the records of a video to a JSON file."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"reddit_id": reddit_id, "stages": stages}, f, indent=4)
+
+
+def write_trace(reddit_id: str, stages: List[dict], path: str) -> None:
+    """Writes the records of a video as a Chrome trace_event file.
+
+    Open it in chrome://tracing or https://ui.perfetto.dev: every process and thread gets a lane
+    with a span per stage, TTS request, screenshot and ffmpeg/ffprobe run, and a counter shows how
+    many stages were running at the same time.
+    """
+    if not stages:
+        return
+    origin = min(record["start"] for record in stages)
+
+    def micros(seconds: float) -> int:
+        return int((seconds - origin) * 1_000_000)
+
+    events = []
+    threads = {}
+    for record in stages:
+        category, _, _ = record["stage"].partition(":")
+        events.append(
+            {
+                "name": record["stage"],
+                "cat": category if ":" in record["stage"] else "stage",
+                "ph": "X",
+                "ts": micros(record["start"]),
+                "dur": max(1, int(record["wall"] * 1_000_000)),
+                "pid": record["pid"],
+                "tid": record.get("tid", record["thread"]),
+                "args": {
+                    key: record[key]
+                    for key in ("cpu", "children_cpu", "rss", "bytes_written", "calls")
+                    if key in record
+                },
+            }
+        )
+        threads[(record["pid"], record.get("tid", record["thread"]))] = record["thread"]
+    for pid in {pid for pid, _ in threads}:
+        events.append(
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"{reddit_id} ({pid})"}}
+        )
+    for (pid, tid), name in threads.items():
+        events.append(
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        )
+
+    # the stages which were running side by side, to see where the pipeline is serial
+    changes = []
+    for record in stages:
+        if record.get("depth", 0) == 0:
+            changes.append((micros(record["start"]), 1))
+            changes.append((micros(record["start"] + record["wall"]), -1))
+    running = 0
+    for ts, change in sorted(changes):
+        running += change
+        events.append(
+            {
+                "name": "running stages",
+                "ph": "C",
+                "ts": ts,
+                "pid": stages[0]["pid"],
+                "args": {"stages": running},
+            }
+        )
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
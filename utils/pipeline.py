@@ -0,0 +1,154 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from utils import metrics
+from utils.checkpoint import StageManifest
+from utils.console import print_substep
+from utils.profiling import profile_stage
+
+# set when the run is stopped (e.g. with Ctrl-C): no stage starts anymore, and the running ones stop
+# at their next check_stop(), so the temp files can be cleared once they returned
+stop_requested = threading.Event()
+
+
+class Stopped(Exception):
+    """Raised by check_stop() in a stage once the run is stopped."""
+
+
+def check_stop() -> None:
+    """Raises Stopped if the run was stopped, for the stages to call between their steps."""
+    if stop_requested.is_set():
+        raise Stopped("The run was stopped")
+
+
+class Stage:
+    """A single step of the video pipeline.
+
+    Args:
+        name (str): Unique name of the stage, used as the key of its result.
+        func (Callable): Called with the results dict of the pipeline once every required stage is done.
+        requires (Iterable[str]): Names of the stages that have to finish before this one starts.
+        outputs (Iterable[str]): Glob patterns of the files the stage makes in the temp folder of the post.
+        checkpoint (bool): Whether the stage is recorded in the manifest and skipped on a restart.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        requires: Iterable[str],
+        outputs: Iterable[str] = (),
+        checkpoint: bool = True,
+    ):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.outputs = tuple(outputs)
+        self.checkpoint = checkpoint
+
+
+class StagePipeline:
+    """Runs the stages of a video as a dependency graph.
+
+    Every stage starts as soon as all the stages it requires are done, so independent stages
+    (e.g. the TTS and the background download) run at the same time.
+
+    With a manifest, finished stages are recorded and the ones which are still done from a previous
+    run are skipped, as long as the stages they require were skipped too.
+
+    Args:
+        max_workers (Optional[int]): How many stages can run at the same time. Use 1 to run them one after another.
+        manifest (Optional[StageManifest]): Where to record the finished stages.
+        reddit_id (Optional[str]): The post the stages belong to, for the per stage metrics.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        manifest: Optional[StageManifest] = None,
+        reddit_id: Optional[str] = None,
+    ):
+        self.max_workers = max_workers
+        self.manifest = manifest
+        self.reddit_id = reddit_id
+        self.stages: Dict[str, Stage] = {}
+        self.results: Dict[str, Any] = {}
+        self.resumed: Set[str] = set()
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        requires: Iterable[str] = (),
+        outputs: Iterable[str] = (),
+        checkpoint: bool = True,
+    ) -> "StagePipeline":
+        if name in self.stages:
+            raise ValueError(f"Stage {name} was added twice")
+        for dependency in requires:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage {name} requires the unknown stage {dependency}")
+        self.stages[name] = Stage(name, func, requires, outputs, checkpoint)
+        return self
+
+    def ready(self, done: Iterable[str], started: Iterable[str]) -> List[Stage]:
+        """Returns the stages whose requirements are all done and which haven't been started yet."""
+        done, started = set(done), set(started)
+        return [
+            stage
+            for stage in self.stages.values()
+            if stage.name not in started and all(dep in done for dep in stage.requires)
+        ]
+
+    def can_resume(self, stage: Stage) -> bool:
+        return (
+            self.manifest is not None
+            and stage.checkpoint
+            and all(dep in self.resumed for dep in stage.requires if self.stages[dep].checkpoint)
+            and self.manifest.completed(stage.name)
+        )
+
+    def run_stage(self, stage: Stage) -> Any:
+        if self.can_resume(stage):
+            print_substep(
+                f"Skipping the {stage.name} stage, it was already done.", style="bold blue"
+            )
+            self.resumed.add(stage.name)
+            return self.manifest.result(stage.name)
+        with metrics.measure(self.reddit_id, stage.name) as record:
+            with profile_stage(self.reddit_id, stage.name):
+                result = stage.func(self.results)
+        if self.manifest is not None and stage.checkpoint:
+            self.manifest.record(stage.name, result, stage.outputs, record["wall"])
+        return result
+
+    def run(self) -> Dict[str, Any]:
+        """Runs every stage and returns their results keyed by stage name.
+
+        The first exception raised by a stage cancels the stages which haven't started yet and is re-raised.
+        Once the run is stopped, the running stages are waited for, they stop at their next check.
+        """
+        running: Dict[Future, Stage] = {}
+        done: List[str] = []
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers or len(self.stages) or 1,
+            thread_name_prefix="stage",
+        )
+        try:
+            while len(done) < len(self.stages):
+                check_stop()
+                started = done + [stage.name for stage in running.values()]
+                for stage in self.ready(done, started):
+                    running[executor.submit(self.run_stage, stage)] = stage
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    self.results[stage.name] = future.result()
+                    done.append(stage.name)
+        except KeyboardInterrupt:
+            stop_requested.set()
+            raise
+        finally:
+            executor.shutdown(wait=not running or stop_requested.is_set(), cancel_futures=True)
+        return self.results
@@ -0,0 +1,135 @@
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Set, TypeVar
+
+from utils import settings
+from utils.console import print_substep
+
+__all__ = ["profiled_stages", "profile_stage", "profiled", "inherit"]
+
+TOP_FUNCTIONS = 30
+
+T = TypeVar("T")
+
+# _active.workers holds the profilers of the jobs handed to other threads by the stage being profiled
+_active = threading.local()
+_lock = threading.Lock()
+
+
+def profiled_stages() -> Set[str]:
+    """The stages to profile, from the RVMB_PROFILE environment variable or
+    settings.performance.profile_stages: a comma separated list of stage names, or "all".
+    """
+    value = os.environ.get("RVMB_PROFILE")
+    if value is None:
+        value = settings.config["settings"]["performance"]["profile_stages"]
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def _enabled(name: str) -> bool:
+    stages = profiled_stages()
+    return "all" in stages or name in stages
+
+
+@contextmanager
+def profile_stage(reddit_id: Optional[str], name: str) -> Iterator[None]:
+    """Runs the block under cProfile if the stage is one of the profiled stages.
+
+    The profile is dumped to assets/temp/profiles/<reddit_id>/<name>.prof (open it with snakeviz or
+    pstats) with a summary of the slowest functions next to it in <name>.txt.
+    A stage running inside another profiled stage of the same thread is part of the outer profile.
+    The jobs the stage runs on other threads are only in the profile when they are wrapped with
+    inherit().
+    """
+    if reddit_id is None or not _enabled(name) or getattr(_active, "workers", None) is not None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiler is already running (e.g. python -m cProfile main.py)
+        print_substep(f"Could not profile {name}, another profiler is active.", style="yellow")
+        yield
+        return
+    workers: List[cProfile.Profile] = []
+    _active.workers = workers
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _active.workers = None
+        with _lock:  # the jobs which are still running are left out
+            workers = list(workers)
+        _dump(profiler, workers, reddit_id, name)
+
+
+def inherit(job: Callable[..., T]) -> Callable[..., T]:
+    """Wraps a job to run on another thread under its own profiler, which is merged into the profile
+    of the stage this thread is profiling. Outside of a profiled stage the job is returned as it is.
+    """
+    workers = getattr(_active, "workers", None)
+    if workers is None:
+        return job
+
+    def run(*args, **kwargs) -> T:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler is already running on this thread
+            return job(*args, **kwargs)
+        saved = getattr(_active, "workers", None)
+        _active.workers = workers  # the jobs it hands on are merged into the same profile
+        try:
+            return job(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _active.workers = saved
+            with _lock:
+                workers.append(profiler)
+
+    return run
+
+
+def _dump(
+    profiler: cProfile.Profile, workers: List[cProfile.Profile], reddit_id: str, name: str
+) -> None:
+    directory = Path(f"assets/temp/profiles/{reddit_id}")
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = re.sub(r"[^\w-]", "_", name)
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    for worker in workers:
+        stats.add(worker)
+    stats.dump_stats(directory / f"{filename}.prof")
+    stats.strip_dirs()
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_FUNCTIONS)
+    with open(directory / f"{filename}.txt", "w", encoding="utf-8") as f:
+        f.write(summary.getvalue())
+    print_substep(f"Saved the profile of {name} to {directory}", style="bold blue")
+
+
+def profiled(name: str) -> Callable:
+    """Decorator for profile_stage, for functions which take the reddit object as reddit_obj."""
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            reddit_obj = signature.bind_partial(*args, **kwargs).arguments.get("reddit_obj")
+            reddit_id = re.sub(r"[^\w\s-]", "", reddit_obj["thread_id"]) if reddit_obj else None
+            with profile_stage(reddit_id, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
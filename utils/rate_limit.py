@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple, Type, TypeVar
+
+from utils.console import print_substep
+
+__all__ = ["RateLimitError", "TokenBucket", "bucket", "call"]
+
+T = TypeVar("T")
+
+ATTEMPTS = 5  # tries of a request, the first one included
+BACKOFF_BASE = 1.0  # seconds, doubled after every failed try
+BACKOFF_CAP = 60.0  # seconds, the longest wait between two tries
+
+
+class RateLimitError(Exception):
+    """Raised by a TTS provider when the service answered that it gets too many requests.
+
+    Args:
+        reset (Optional[float]): The unix time at which requests are accepted again, if the service
+            said so.
+    """
+
+    def __init__(self, message: str = "Rate limited", reset: Optional[float] = None):
+        super().__init__(message)
+        self.reset = reset
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, str], message: str = "Rate limited"):
+        """Reads the end of the cooldown from X-RateLimit-Reset (unix time) or Retry-After (seconds)."""
+        reset = None
+        try:
+            if "X-RateLimit-Reset" in headers:
+                reset = float(headers["X-RateLimit-Reset"])
+            elif "Retry-After" in headers:
+                reset = time.time() + float(headers["Retry-After"])
+        except ValueError:  # Retry-After can also be an http date, backing off is good enough then
+            pass
+        return cls(message, reset)
+
+
+class TokenBucket:
+    """Lets through rate requests per second on average, and up to burst at once.
+
+    When the service rate limits anyway, pause_until() holds every request of the bucket until the
+    cooldown is over. Only the threads waiting on this bucket are held, the other providers and
+    stages carry on.
+
+    Args:
+        rate (Optional[float]): Requests per second, None for no limit besides the cooldowns.
+        burst (int): How many requests can be made at once after a quiet period.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0  # time.time()
+        self.condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """Waits for a token."""
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.time()
+                if wait <= 0:
+                    if self.rate is None:
+                        return
+                    now = time.monotonic()
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                self.condition.wait(wait)
+
+    def pause_until(self, reset: float) -> None:
+        """Holds the requests until the unix time reset, and restarts slowly after it."""
+        with self.condition:
+            if reset > self.paused_until:
+                self.paused_until = reset
+                self.tokens = 0.0
+                self.updated = time.monotonic() + max(0.0, reset - time.time())
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket(name: str, rate: Optional[float] = None, burst: int = 1) -> TokenBucket:
+    """The bucket of a provider, shared by every TTSEngine of the process."""
+    with _buckets_lock:
+        if name not in _buckets:
+            _buckets[name] = TokenBucket(rate, burst)
+        return _buckets[name]
+
+
+def backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter, so retries of several threads don't line up."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+
+
+def call(
+    name: str,
+    func: Callable[[], T],
+    rate: Optional[float] = None,
+    burst: int = 1,
+    retryable: Tuple[Type[BaseException], ...] = (),
+    attempts: int = ATTEMPTS,
+) -> T:
+    """Calls func within the rate of the provider, and tries again when it fails for a while.
+
+    Args:
+        name (str): The provider, the calls with the same name share their bucket.
+        func (Callable): Makes the request.
+        rate (Optional[float]): Requests per second of the provider, see TokenBucket.
+        burst (int): Requests the provider takes at once, see TokenBucket.
+        retryable (Tuple): Exceptions of passing failures (connection reset, timeout...), tried
+            again after a backoff. A RateLimitError is always tried again.
+        attempts (int): How many times to try.
+    """
+    limiter = bucket(name, rate, burst)
+    for attempt in range(attempts):
+        limiter.acquire()
+        try:
+            return func()
+        except RateLimitError as error:
+            if attempt + 1 == attempts:
+                raise
+            reset = error.reset if error.reset is not None else time.time() + backoff(attempt)
+            # a little jitter, so the waiting requests don't all come back at the same instant
+            limiter.pause_until(reset + random.uniform(0, BACKOFF_BASE))
+            print_substep(
+                f"{name} is rate limited, trying again in {max(0, reset - time.time()):.0f} seconds.",
+                style="yellow",
+            )
+        except retryable as error:
+            if attempt + 1 == attempts:
+                raise
+            wait = backoff(attempt)
+            print_substep(f"{name} failed ({error!r}), trying again in {wait:.1f} seconds.")
+            time.sleep(wait)
@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+__all__ = ["SpeechRates", "speech_rates"]
+
+
+class SpeechRates:
+    """How many characters per second every provider and voice reads, in assets/cache/speech_rates.json
+
+    The rate is an exponential moving average of the rate of every run, so it follows a provider
+    which changes its voices without being thrown off by a single odd post.
+
+    Args:
+        path (str): The json file the rates are kept in.
+        smoothing (float): The weight of the newest run in the average.
+    """
+
+    def __init__(self, path: str, smoothing: float = 0.3):
+        self.path = Path(path)
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.rates: Dict[str, dict] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.rates = {}
+
+    def rate(self, voice: str) -> Optional[float]:
+        """The characters per second of the voice, None before its first run."""
+        with self.lock:
+            entry = self.rates.get(voice)
+        return entry["chars_per_second"] if entry else None
+
+    def update(self, voice: str, chars: int, seconds: float) -> None:
+        """Adds the characters read and the seconds of audio of a run to the average, and saves it."""
+        if chars <= 0 or seconds <= 0:
+            return
+        rate = chars / seconds
+        with self.lock:
+            entry = self.rates.get(voice)
+            if entry is not None:
+                rate = self.smoothing * rate + (1 - self.smoothing) * entry["chars_per_second"]
+            self.rates[voice] = {
+                "chars_per_second": round(rate, 4),
+                "runs": (entry["runs"] if entry else 0) + 1,
+            }
+            self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.rates, f, indent=4, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+
+_rates: Optional[SpeechRates] = None
+_rates_lock = threading.Lock()
+
+
+def speech_rates() -> SpeechRates:
+    """The speech rates shared by every TTSEngine."""
+    global _rates
+    with _rates_lock:
+        if _rates is None:
+            _rates = SpeechRates("assets/cache/speech_rates.json")
+        return _rates
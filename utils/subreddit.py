@@ -2,8 +2,8 @@ import json
 from os.path import exists
 
 from utils import settings
-from utils.ai_methods import sort_by_similarity
 from utils.console import print_substep
+from utils.videos import in_progress, videos_lock
 
 
 def get_subreddit_undone(submissions: list, subreddit, times_checked=0, similarity_scores=None):
@@ -19,19 +19,27 @@ def get_subreddit_undone(submissions: list, subreddit, times_checked=0, similari
     # Second try of getting a valid Submission
     if times_checked and settings.config["ai"]["ai_similarity_enabled"]:
         print("Sorting based on similarity for a different date filter and thread limit..")
+        from utils.ai_methods import (
+            sort_by_similarity,  # torch and transformers take a while
+        )
+
         submissions = sort_by_similarity(
             submissions, keywords=settings.config["ai"]["ai_similarity_enabled"]
         )
 
     # recursively checks if the top submission in the list was already done.
-    if not exists("./video_creation/data/videos.json"):
-        with open("./video_creation/data/videos.json", "w+") as f:
-            json.dump([], f)
-    with open("./video_creation/data/videos.json", "r", encoding="utf-8") as done_vids_raw:
-        done_videos = json.load(done_vids_raw)
+    with videos_lock:
+        if not exists("./video_creation/data/videos.json"):
+            with open("./video_creation/data/videos.json", "w+") as f:
+                json.dump([], f)
+        with open("./video_creation/data/videos.json", "r", encoding="utf-8") as done_vids_raw:
+            done_videos = json.load(done_vids_raw)
     for i, submission in enumerate(submissions):
         if already_done(done_videos, submission):
             continue
+        if str(submission) in in_progress:
+            print_substep("This post is already being generated. Skipping...")
+            continue
         if submission.over_18:
             try:
                 if not settings.config["settings"]["allow_nsfw"]:
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utils import metrics, settings
+from utils.console import print_substep
+
+__all__ = ["Translations", "translations", "translate", "prefetch"]
+
+TRANSLATOR = "google"
+MAX_BATCH_CHARS = 4000  # the texts of a request, joined by new lines, under the limit of Google
+SEPARATOR = "\n"
+
+
+class Translations:
+    """The translations of the texts of the videos, in assets/cache/translations.json
+
+    Every text is translated once per language, whichever stage asks first (the TTS, the screenshots
+    or the file name), and the texts of a thread are sent together in as few requests as possible.
+
+    Args:
+        path (str): The json file the translations are kept in.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.translations: Dict[str, Dict[str, str]] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.translations = {}
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def cached(self, text: str, lang: str) -> Optional[str]:
+        with self.lock:
+            return self.translations.get(lang, {}).get(self.key(text))
+
+    def translate_many(self, texts: Iterable[str], lang: str) -> List[str]:
+        """Translates the texts to lang, requesting only the ones which were never translated."""
+        texts = list(texts)
+        missing = list(dict.fromkeys(text for text in texts if self.cached(text, lang) is None))
+        if missing:
+            self.request(missing, lang)
+        return [self.cached(text, lang) or text for text in texts]
+
+    def request(self, texts: List[str], lang: str) -> None:
+        import translators
+
+        batches: List[List[str]] = [[]]
+        for text in texts:
+            if SEPARATOR in text or len(text) > MAX_BATCH_CHARS:
+                batches.append([text])  # on its own, its lines would be taken for other texts
+                batches.append([])
+            elif sum(len(t) + 1 for t in batches[-1]) + len(text) > MAX_BATCH_CHARS:
+                batches.append([text])
+            else:
+                batches[-1].append(text)
+
+        results: Dict[str, str] = {}
+        for batch in filter(None, batches):
+            metrics.count("translate_request")
+            translated = translators.translate_text(
+                SEPARATOR.join(batch), translator=TRANSLATOR, to_language=lang
+            )
+            lines = [line.strip() for line in translated.split(SEPARATOR)] if len(batch) > 1 else []
+            if len(batch) == 1:
+                results[batch[0]] = translated
+            elif len(lines) == len(batch):
+                results.update(zip(batch, lines))
+            else:  # the translator merged or split lines, this batch is sent one text at a time
+                for text in batch:
+                    metrics.count("translate_request")
+                    results[text] = translators.translate_text(
+                        text, translator=TRANSLATOR, to_language=lang
+                    )
+        with self.lock:
+            memo = self.translations.setdefault(lang, {})
+            for text, translated in results.items():
+                memo[self.key(text)] = translated
+            self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.translations, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+_translations: Optional[Translations] = None
+_translations_lock = threading.Lock()
+
+
+def translations() -> Translations:
+    """The translations shared by every stage."""
+    global _translations
+    with _translations_lock:
+        if _translations is None:
+            _translations = Translations("assets/cache/translations.json")
+        return _translations
+
+
+def translate(text: str, lang: Optional[str] = None) -> str:
+    """The text in lang, settings.reddit.thread.post_lang by default."""
+    lang = lang or settings.config["reddit"]["thread"]["post_lang"]
+    return translations().translate_many([text], lang)[0]
+
+
+def prefetch(texts: Iterable[str], lang: Optional[str] = None) -> None:
+    """Translates the texts in batches ahead of the stages which need them one by one."""
+    lang = lang or settings.config["reddit"]["thread"]["post_lang"]
+    texts = [text for text in texts if text and not text.isspace()]
+    if lang and texts:
+        print_substep("Translating the thread...")
+        translations().translate_many(texts, lang)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from utils import settings
+
+__all__ = ["TTSCache", "tts_cache"]
+
+# the setting holding the voice of every provider, random voices are cached as "random"
+VOICE_SETTINGS = {
+    "TikTok": "tiktok_voice",
+    "AWSPolly": "aws_polly_voice",
+    "StreamlabsPolly": "streamlabs_polly_voice",
+    "elevenlabs": "elevenlabs_voice_name",
+    "pyttsx": "python_voice",
+    "LocalTTS": "local_voice",
+}
+
+
+class TTSCache:
+    """Keeps the audio of every text read by the TTS in assets/cache/tts, so reading the same text
+    with the same provider, voice and language again costs a hardlink instead of a request.
+
+    Every entry is <sha256>.mp3 with its duration in <sha256>.json. When the cache is bigger than
+    max_bytes the least recently used entries are removed.
+
+    Args:
+        directory (str): Where the audio is kept.
+        max_bytes (int): The size of the cache.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.size = sum(path.stat().st_size for path in self.directory.glob("*.mp3"))
+
+    @staticmethod
+    def key(provider: str, voice: str, lang: str, text: str) -> str:
+        return hashlib.sha256("\0".join((provider, voice, lang, text)).encode("utf-8")).hexdigest()
+
+    def __contains__(self, key: str) -> bool:
+        return (self.directory / f"{key}.json").exists()
+
+    def get(self, key: str, filepath: str) -> Optional[float]:
+        """Puts the cached audio at filepath.
+
+        Returns:
+            Optional[float]: The duration of the audio, None if the text isn't cached
+        """
+        audio = self.directory / f"{key}.mp3"
+        try:
+            with open(self.directory / f"{key}.json", "r", encoding="utf-8") as f:
+                duration = json.load(f)["duration"]
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            try:
+                os.link(audio, filepath)
+            except OSError:  # another filesystem, or links aren't supported
+                shutil.copyfile(audio, filepath)
+            os.utime(audio)  # most recently used
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        return duration
+
+    def put(self, key: str, filepath: str, duration: float) -> None:
+        """Adds the audio at filepath to the cache."""
+        audio = self.directory / f"{key}.mp3"
+        temp = self.directory / f"{key}.{threading.get_ident()}.tmp"
+        shutil.copyfile(filepath, temp)
+        with self.lock:
+            if audio.exists():
+                self.size -= audio.stat().st_size
+            os.replace(temp, audio)
+            with open(self.directory / f"{key}.json", "w", encoding="utf-8") as f:
+                json.dump({"duration": duration, "added": int(time.time())}, f)
+            self.size += audio.stat().st_size
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self.directory.glob("*.mp3"), key=lambda path: path.stat().st_mtime)
+        for audio in entries:
+            if self.size <= self.max_bytes:
+                break
+            self.size -= audio.stat().st_size
+            audio.unlink()
+            (self.directory / f"{audio.stem}.json").unlink(missing_ok=True)
+
+
+_cache: Optional[TTSCache] = None
+_cache_lock = threading.Lock()
+
+
+def tts_cache() -> Optional[TTSCache]:
+    """The cache shared by every TTSEngine, None if settings.performance.tts_cache_mb is 0."""
+    global _cache
+    max_mb = settings.config["settings"]["performance"]["tts_cache_mb"]
+    if not max_mb:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSCache("assets/cache/tts", max_mb * 1024 * 1024)
+        return _cache
@@ -1,11 +1,20 @@
 import json
+import multiprocessing
+import os
 import time
+from typing import Set
 
 from praw.models import Submission
 
 from utils import settings
 from utils.console import print_step
 
+# Ids of the posts that are being generated right now. Batches prepare several posts at the same time,
+# and these haven't been saved to videos.json yet.
+in_progress: Set[str] = set()
+# Guards video_creation/data/videos.json, also shared with the render processes (see utils/governor.py)
+videos_lock = multiprocessing.get_context("spawn").Lock()
+
 
 def check_done(
     redditobj: Submission,
@@ -19,8 +28,9 @@ def check_done(
     Returns:
         Submission|None: Reddit object in args
     """
-    with open("./video_creation/data/videos.json", "r", encoding="utf-8") as done_vids_raw:
-        done_videos = json.load(done_vids_raw)
+    with videos_lock:
+        with open("./video_creation/data/videos.json", "r", encoding="utf-8") as done_vids_raw:
+            done_videos = json.load(done_vids_raw)
     for video in done_videos:
         if video["id"] == str(redditobj):
             if settings.config["reddit"]["thread"]["post_id"]:
@@ -43,8 +53,9 @@ def save_data(subreddit: str, filename: str, reddit_title: str, reddit_id: str,
         @param reddit_id:
         @param reddit_title:
     """
-    with open("./video_creation/data/videos.json", "r+", encoding="utf-8") as raw_vids:
-        done_vids = json.load(raw_vids)
+    with videos_lock:
+        with open("./video_creation/data/videos.json", "r", encoding="utf-8") as raw_vids:
+            done_vids = json.load(raw_vids)
         if reddit_id in [video["id"] for video in done_vids]:
             return  # video already done but was specified to continue anyway in the config file
         payload = {
@@ -56,5 +67,7 @@ def save_data(subreddit: str, filename: str, reddit_title: str, reddit_id: str,
             "filename": filename,
         }
         done_vids.append(payload)
-        raw_vids.seek(0)
-        json.dump(done_vids, raw_vids, ensure_ascii=False, indent=4)
+        # write to a temporary file first, so readers never see a half written file
+        with open("./video_creation/data/videos.json.tmp", "w", encoding="utf-8") as raw_vids:
+            json.dump(done_vids, raw_vids, ensure_ascii=False, indent=4)
+        os.replace("./video_creation/data/videos.json.tmp", "./video_creation/data/videos.json")
@@ -1,68 +1,48 @@
 import re
-import sys
-import time as pytime
-from datetime import datetime
-from time import sleep
-
-from cleantext import clean
-from requests import Response
+from typing import List
 
 from utils import settings
 
-if sys.version_info[0] >= 3:
-    from datetime import timezone
+SENTENCE_ENDS = (". ", "! ", "? ", ".\n", "!\n", "?\n")
+CLAUSE_ENDS = (", ", "; ", ": ", ",\n", ";\n", ":\n")
 
 
-def check_ratelimit(response: Response) -> bool:
-    """
-    Checks if the response is a ratelimit response.
-    If it is, it sleeps for the time specified in the response.
-    """
-    if response.status_code == 429:
-        try:
-            time = int(response.headers["X-RateLimit-Reset"])
-            print(f"Ratelimit hit. Sleeping for {time - int(pytime.time())} seconds.")
-            sleep_until(time)
-            return False
-        except KeyError:  # if the header is not present, we don't know how long to wait
-            return False
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """Splits the text in parts of at most max_chars for the TTS, in a single pass.
 
-    return True
+    Every part ends at the last sentence end of its window, else at the last clause end, else at the
+    last whitespace, else it's cut at max_chars. Only the second half of the window is searched, so
+    every part is at least half as long as the window and the whole text is read about twice.
 
+    Args:
+        text (str): Text to be split
+        max_chars (int): The longest text the TTS can read at once
 
-def sleep_until(time) -> None:
-    """
-    Pause your program until a specific end time.
-    'time' is either a valid datetime object or unix timestamp in seconds (i.e. seconds since Unix epoch)
+    Returns:
+        List[str]: The parts, stripped, without the empty ones
     """
-    end = time
-
-    # Convert datetime to unix timestamp and adjust for locality
-    if isinstance(time, datetime):
-        # If we're on Python 3 and the user specified a timezone, convert to UTC and get the timestamp.
-        if sys.version_info[0] >= 3 and time.tzinfo:
-            end = time.astimezone(timezone.utc).timestamp()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + max_chars
+        if end >= len(text):
+            cut = len(text)
         else:
-            zoneDiff = pytime.time() - (datetime.now() - datetime(1970, 1, 1)).total_seconds()
-            end = (time - datetime(1970, 1, 1)).total_seconds() + zoneDiff
-
-    # Type check
-    if not isinstance(end, (int, float)):
-        raise Exception("The time parameter is not a number or datetime object")
-
-    # Now we wait
-    while True:
-        now = pytime.time()
-        diff = end - now
-
-        #
-        # Time is up!
-        #
-        if diff <= 0:
-            break
-        else:
-            # 'logarithmic' sleeping to minimize loop iterations
-            sleep(diff / 2)
+            lower = start + max_chars // 2
+            cut = -1
+            for marks, offset in ((SENTENCE_ENDS, 1), (CLAUSE_ENDS, 1), ((" ", "\n"), 0)):
+                # the mark ends before end + 1, so the punctuation is part of the window
+                found = max(text.rfind(mark, lower, end + 1) for mark in marks)
+                if found != -1:
+                    cut = found + offset
+                    break
+            if cut <= start:
+                cut = end
+        chunk = text[start:cut].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = cut
+    return chunks
 
 
 def sanitize_text(text: str) -> str:
@@ -90,6 +70,8 @@ def sanitize_text(text: str) -> str:
 
     # emoji removal if the setting is enabled
     if settings.config["settings"]["tts"]["no_emojis"]:
+        from cleantext import clean
+
         result = clean(result, no_emoji=True)
 
     # remove extra whitespace
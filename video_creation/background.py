@@ -5,11 +5,7 @@ from pathlib import Path
 from random import randrange
 from typing import Any, Dict, Tuple
 
-import yt_dlp
-from moviepy.editor import AudioFileClip, VideoFileClip
-from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_subclip
-
-from utils import settings
+from utils import metrics, settings
 from utils.console import print_step, print_substep
 
 
@@ -27,12 +23,8 @@ def load_background_options():
     del background_options["video"]["__comment"]
     del background_options["audio"]["__comment"]
 
-    for name in list(background_options["video"].keys()):
-        pos = background_options["video"][name][3]
-
-        if pos != "center":
-            background_options["video"][name][3] = lambda t: ("center", pos + t)
-
+    # the position of a video ("center" or an offset in pixels) stays as it is in the json, so the
+    # config can be pickled for the render processes and stored in the checkpoints
     return background_options
 
 
@@ -100,6 +92,8 @@ def download_background_video(background_config: Tuple[str, str, str, Any]):
         "no_warnings": True,
     }
 
+    import yt_dlp
+
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         ydl.download(uri)
     print_substep("Background video downloaded successfully! 🎉", style="bold green")
@@ -127,6 +121,8 @@ def download_background_audio(background_config: Tuple[str, str, str]):
         "extract_audio": True,
     }
 
+    import yt_dlp
+
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         ydl.download([uri])
 
@@ -140,6 +136,9 @@ def chop_background(background_config: Dict[str, Tuple], video_length: int, redd
         background_config (Dict[str,Tuple]]) : Current background configuration
         video_length (int): Length of the clip where the background footage is to be taken out of
     """
+    from moviepy.editor import AudioFileClip, VideoFileClip
+    from moviepy.video.io.ffmpeg_tools import ffmpeg_extract_subclip
+
     id = re.sub(r"[^\w\s-]", "", reddit_object["thread_id"])
 
     if settings.config["settings"]["background"][f"background_audio_volume"] == 0:
@@ -152,7 +151,9 @@ def chop_background(background_config: Dict[str, Tuple], video_length: int, redd
             video_length, background_audio.duration
         )
         background_audio = background_audio.subclip(start_time_audio, end_time_audio)
-        background_audio.write_audiofile(f"assets/temp/{id}/background.mp3")
+        with metrics.measure(id, "ffmpeg:background_audio", [f"assets/temp/{id}/background.mp3"]):
+            metrics.count("ffmpeg")
+            background_audio.write_audiofile(f"assets/temp/{id}/background.mp3")
 
     print_step("Finding a spot in the backgrounds video to chop...✂️")
     video_choice = f"{background_config['video'][2]}-{background_config['video'][1]}"
@@ -162,12 +163,14 @@ def chop_background(background_config: Dict[str, Tuple], video_length: int, redd
     )
     # Extract video subclip
     try:
-        ffmpeg_extract_subclip(
-            f"assets/backgrounds/video/{video_choice}",
-            start_time_video,
-            end_time_video,
-            targetname=f"assets/temp/{id}/background.mp4",
-        )
+        with metrics.measure(id, "ffmpeg:background_video", [f"assets/temp/{id}/background.mp4"]):
+            metrics.count("ffmpeg")
+            ffmpeg_extract_subclip(
+                f"assets/backgrounds/video/{video_choice}",
+                start_time_video,
+                end_time_video,
+                targetname=f"assets/temp/{id}/background.mp4",
+            )
     except (OSError, IOError):  # ffmpeg issue see #348
         print_substep("FFMPEG issue. Trying again...")
         with VideoFileClip(f"assets/backgrounds/video/{video_choice}") as video:
@@ -1,4 +1,3 @@
-import multiprocessing
 import os
 import re
 import tempfile
@@ -7,19 +6,21 @@ import threading
 import time
 from os.path import exists  # Needs to be imported specifically
 from pathlib import Path
-from typing import Dict, Final, Tuple
+from typing import Dict, Final, List, Tuple
 
 import ffmpeg
-import translators
 from PIL import Image, ImageDraw, ImageFont
 from rich.console import Console
-from rich.progress import track
 
-from utils import settings
+from utils import metrics, settings
+from utils.audio_duration import load_durations
 from utils.cleanup import cleanup
-from utils.console import print_step, print_substep
+from utils.console import print_step, print_substep, track
 from utils.fonts import getheight
+from utils.governor import ffmpeg_threads
+from utils.profiling import profiled
 from utils.thumbnail import create_thumbnail
+from utils.translation import translate
 from utils.videos import save_data
 
 console = Console()
@@ -67,20 +68,54 @@ class ProgressFfmpeg(threading.Thread):
 
 
 def name_normalize(name: str) -> str:
+    lang = settings.config["reddit"]["thread"]["post_lang"]
+    if lang:
+        # the title as it is was translated with the rest of the thread, the result is sanitized
+        print_substep("Translating filename...")
+        name = translate(name, lang)
+
     name = re.sub(r'[?\\"%*:|<>]', "", name)
     name = re.sub(r"( [w,W]\s?\/\s?[o,O,0])", r" without", name)
     name = re.sub(r"( [w,W]\s?\/)", r" with", name)
     name = re.sub(r"(\d+)\s?\/\s?(\d+)", r"\1 of \2", name)
     name = re.sub(r"(\w+)\s?\/\s?(\w+)", r"\1 or \2", name)
     name = re.sub(r"\/", r"", name)
+    return name
 
-    lang = settings.config["reddit"]["thread"]["post_lang"]
-    if lang:
-        print_substep("Translating filename...")
-        translated_name = translators.translate_text(name, translator="google", to_language=lang)
-        return translated_name
-    else:
-        return name
+
+def probe_duration(reddit_id: str, path: str, durations: Dict[str, float]) -> float:
+    """Length in seconds of an audio file, from the durations index of the TTS or else with ffprobe"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name in durations:
+        return durations[name]
+    with metrics.measure(reddit_id, f"ffprobe:{os.path.basename(path)}"):
+        metrics.count("ffprobe")
+        return float(ffmpeg.probe(path)["format"]["duration"])
+
+
+def build_overlay_chain(background_clip, image_clips: List, durations: List[float], opacity: float):
+    """Overlays the images on the background one after another, each one while its audio plays.
+
+    Args:
+        background_clip: The ffmpeg stream of the background.
+        image_clips (List): The ffmpeg streams of the images (title first, then the comments).
+        durations (List[float]): How long every image is shown, in seconds.
+        opacity (float): The opacity of the images.
+
+    Returns:
+        The ffmpeg stream of the background with one overlay filter per image
+    """
+    current_time = 0
+    for image_clip, duration in zip(image_clips, durations):
+        image_overlay = image_clip.filter("colorchannelmixer", aa=opacity)
+        background_clip = background_clip.overlay(
+            image_overlay,
+            enable=f"between(t,{current_time},{current_time + duration})",
+            x="(main_w-overlay_w)/2",
+            y="(main_h-overlay_h)/2",
+        )
+        current_time += duration
+    return background_clip
 
 
 def prepare_background(reddit_id: str, W: int, H: int) -> str:
@@ -95,13 +130,15 @@ def prepare_background(reddit_id: str, W: int, H: int) -> str:
                 "c:v": "h264",
                 "b:v": "20M",
                 "b:a": "192k",
-                "threads": multiprocessing.cpu_count(),
+                "threads": ffmpeg_threads(),
             },
         )
         .overwrite_output()
     )
     try:
-        output.run(quiet=True)
+        with metrics.measure(reddit_id, "prepare_background", outputs=[output_path]):
+            metrics.count("ffmpeg")
+            output.run(quiet=True)
     except ffmpeg.Error as e:
         print(e.stderr.decode("utf8"))
         exit(1)
@@ -185,6 +222,7 @@ def merge_background_audio(audio: ffmpeg, reddit_id: str):
         return merged_audio  # Return merged audio
 
 
+@profiled("make_final_video")
 def make_final_video(
     number_of_clips: int,
     length: int,
@@ -197,6 +235,9 @@ def make_final_video(
         length (int): Length of the video
         reddit_obj (dict): The reddit object that contains the posts to read.
         background_config (Tuple[str, str, str, Any]): The background config to use.
+
+    Returns:
+        str: The path of the video
     """
     # settings values
     W: Final[int] = int(settings.config["settings"]["resolution_w"])
@@ -214,6 +255,7 @@ def make_final_video(
     print_step("Creating the final video 🎥")
 
     background_clip = ffmpeg.input(prepare_background(reddit_id, W=W, H=H))
+    durations = load_durations(f"assets/temp/{reddit_id}/mp3")
 
     # Gather all audio clips
     audio_clips = list()
@@ -239,18 +281,21 @@ def make_final_video(
         ]
         audio_clips.insert(0, ffmpeg.input(f"assets/temp/{reddit_id}/mp3/title.mp3"))
 
-        audio_clips_durations = [
-            float(ffmpeg.probe(f"assets/temp/{reddit_id}/mp3/{i}.mp3")["format"]["duration"])
-            for i in range(number_of_clips)
-        ]
-        audio_clips_durations.insert(
-            0,
-            float(ffmpeg.probe(f"assets/temp/{reddit_id}/mp3/title.mp3")["format"]["duration"]),
-        )
+        with metrics.measure(reddit_id, "probe_durations"):
+            audio_clips_durations = [
+                probe_duration(reddit_id, f"assets/temp/{reddit_id}/mp3/{i}.mp3", durations)
+                for i in range(number_of_clips)
+            ]
+            audio_clips_durations.insert(
+                0,
+                probe_duration(reddit_id, f"assets/temp/{reddit_id}/mp3/title.mp3", durations),
+            )
     audio_concat = ffmpeg.concat(*audio_clips, a=1, v=0)
-    ffmpeg.output(
-        audio_concat, f"assets/temp/{reddit_id}/audio.mp3", **{"b:a": "192k"}
-    ).overwrite_output().run(quiet=True)
+    with metrics.measure(reddit_id, "audio_concat", outputs=[f"assets/temp/{reddit_id}/audio.mp3"]):
+        metrics.count("ffmpeg")
+        ffmpeg.output(
+            audio_concat, f"assets/temp/{reddit_id}/audio.mp3", **{"b:a": "192k"}
+        ).overwrite_output().run(quiet=True)
 
     console.log(f"[bold green] Video Will Be: {length} Seconds Long")
 
@@ -286,16 +331,17 @@ def make_final_video(
 
     current_time = 0
     if settings.config["settings"]["storymode"]:
-        audio_clips_durations = [
-            float(
-                ffmpeg.probe(f"assets/temp/{reddit_id}/mp3/postaudio-{i}.mp3")["format"]["duration"]
+        with metrics.measure(reddit_id, "probe_durations"):
+            audio_clips_durations = [
+                probe_duration(
+                    reddit_id, f"assets/temp/{reddit_id}/mp3/postaudio-{i}.mp3", durations
+                )
+                for i in range(number_of_clips)
+            ]
+            audio_clips_durations.insert(
+                0,
+                probe_duration(reddit_id, f"assets/temp/{reddit_id}/mp3/title.mp3", durations),
             )
-            for i in range(number_of_clips)
-        ]
-        audio_clips_durations.insert(
-            0,
-            float(ffmpeg.probe(f"assets/temp/{reddit_id}/mp3/title.mp3")["format"]["duration"]),
-        )
         if settings.config["settings"]["storymodemethod"] == 0:
             image_clips.insert(
                 1,
@@ -331,23 +377,25 @@ def make_final_video(
                     "scale", screenshot_width, -1
                 )
             )
-            image_overlay = image_clips[i].filter("colorchannelmixer", aa=opacity)
-            assert (
-                audio_clips_durations is not None
-            ), "Please make a GitHub issue if you see this. Ping @JasonLovesDoggo on GitHub."
-            background_clip = background_clip.overlay(
-                image_overlay,
-                enable=f"between(t,{current_time},{current_time + audio_clips_durations[i]})",
-                x="(main_w-overlay_w)/2",
-                y="(main_h-overlay_h)/2",
-            )
-            current_time += audio_clips_durations[i]
+        assert (
+            audio_clips_durations is not None
+        ), "Please make a GitHub issue if you see this. Ping @JasonLovesDoggo on GitHub."
+        background_clip = build_overlay_chain(
+            background_clip,
+            image_clips[: number_of_clips + 1],
+            audio_clips_durations[: number_of_clips + 1],
+            opacity,
+        )
 
     title = re.sub(r"[^\w\s-]", "", reddit_obj["thread_title"])
     idx = re.sub(r"[^\w\s-]", "", reddit_obj["thread_id"])
     title_thumb = reddit_obj["thread_title"]
 
-    filename = f"{name_normalize(title)[:251]}"
+    if settings.config["reddit"]["thread"]["post_lang"]:
+        # the raw title is the one translated with the thread, sanitized once translated
+        filename = re.sub(r"[^\w\s-]", "", name_normalize(reddit_obj["thread_title"]))[:251]
+    else:
+        filename = f"{name_normalize(title)[:251]}"
     subreddit = settings.config["reddit"]["thread"]["subreddit"]
 
     if not exists(f"./results/{subreddit}"):
@@ -421,46 +469,18 @@ def make_final_video(
             path[:251] + ".mp4"
         )  # Prevent a error by limiting the path length, do not change this.
         try:
-            ffmpeg.output(
-                background_clip,
-                final_audio,
-                path,
-                f="mp4",
-                **{
-                    "c:v": "h264",
-                    "b:v": "20M",
-                    "b:a": "192k",
-                    "threads": multiprocessing.cpu_count(),
-                },
-            ).overwrite_output().global_args("-progress", progress.output_file.name).run(
-                quiet=True,
-                overwrite_output=True,
-                capture_stdout=False,
-                capture_stderr=False,
-            )
-        except ffmpeg.Error as e:
-            print(e.stderr.decode("utf8"))
-            exit(1)
-    old_percentage = pbar.n
-    pbar.update(100 - old_percentage)
-    if allowOnlyTTSFolder:
-        path = defaultPath + f"/OnlyTTS/{filename}"
-        path = (
-            path[:251] + ".mp4"
-        )  # Prevent a error by limiting the path length, do not change this.
-        print_step("Rendering the Only TTS Video 🎥")
-        with ProgressFfmpeg(length, on_update_example) as progress:
-            try:
+            with metrics.measure(reddit_id, "final_encode", outputs=[path]):
+                metrics.count("ffmpeg")
                 ffmpeg.output(
                     background_clip,
-                    audio,
+                    final_audio,
                     path,
                     f="mp4",
                     **{
                         "c:v": "h264",
                         "b:v": "20M",
                         "b:a": "192k",
-                        "threads": multiprocessing.cpu_count(),
+                        "threads": ffmpeg_threads(),
                     },
                 ).overwrite_output().global_args("-progress", progress.output_file.name).run(
                     quiet=True,
@@ -468,6 +488,39 @@ def make_final_video(
                     capture_stdout=False,
                     capture_stderr=False,
                 )
+        except ffmpeg.Error as e:
+            print(e.stderr.decode("utf8"))
+            exit(1)
+    old_percentage = pbar.n
+    pbar.update(100 - old_percentage)
+    video_path = path
+    if allowOnlyTTSFolder:
+        path = defaultPath + f"/OnlyTTS/{filename}"
+        path = (
+            path[:251] + ".mp4"
+        )  # Prevent a error by limiting the path length, do not change this.
+        print_step("Rendering the Only TTS Video 🎥")
+        with ProgressFfmpeg(length, on_update_example) as progress:
+            try:
+                with metrics.measure(reddit_id, "only_tts_encode", outputs=[path]):
+                    metrics.count("ffmpeg")
+                    ffmpeg.output(
+                        background_clip,
+                        audio,
+                        path,
+                        f="mp4",
+                        **{
+                            "c:v": "h264",
+                            "b:v": "20M",
+                            "b:a": "192k",
+                            "threads": ffmpeg_threads(),
+                        },
+                    ).overwrite_output().global_args("-progress", progress.output_file.name).run(
+                        quiet=True,
+                        overwrite_output=True,
+                        capture_stdout=False,
+                        capture_stderr=False,
+                    )
             except ffmpeg.Error as e:
                 print(e.stderr.decode("utf8"))
                 exit(1)
@@ -480,3 +533,4 @@ def make_final_video(
     cleanups = cleanup(reddit_id)
     print_substep(f"Removed {cleanups} temporary files 🗑")
     print_step("Done! 🎉 The video is in the results folder 📁")
+    return video_path
@@ -3,14 +3,12 @@ import re
 from pathlib import Path
 from typing import Dict, Final
 
-import translators
-from playwright.sync_api import ViewportSize, sync_playwright
-from rich.progress import track
-
-from utils import settings
-from utils.console import print_step, print_substep
+from utils import metrics, settings
+from utils.console import print_step, print_substep, track
 from utils.imagenarator import imagemaker
+from utils.pipeline import check_stop
 from utils.playwright import clear_cookie_by_name
+from utils.translation import prefetch, translate
 from utils.videos import save_data
 
 __all__ = ["get_screenshots_of_reddit_posts"]
@@ -69,6 +67,8 @@ def get_screenshots_of_reddit_posts(reddit_object: dict, screenshot_num: int):
             transparent=transparent,
         )
 
+    from playwright.sync_api import ViewportSize, sync_playwright
+
     screenshot_num: int
     with sync_playwright() as p:
         print_substep("Launching Headless Browser...")
@@ -130,83 +130,92 @@ def get_screenshots_of_reddit_posts(reddit_object: dict, screenshot_num: int):
             # Reload the page for the redesign to take effect
             page.reload()
         # Get the thread screenshot
-        page.goto(reddit_object["thread_url"], timeout=0)
-        page.set_viewport_size(ViewportSize(width=W, height=H))
-        page.wait_for_load_state()
-        page.wait_for_timeout(5000)
+        with metrics.measure(
+            reddit_id, "screenshot:title", outputs=[f"assets/temp/{reddit_id}/png/title.png"]
+        ):
+            metrics.count("page_load")
+            page.goto(reddit_object["thread_url"], timeout=0)
+            page.set_viewport_size(ViewportSize(width=W, height=H))
+            page.wait_for_load_state()
+            page.wait_for_timeout(5000)
+
+            if page.locator(
+                "#t3_12hmbug > div > div._3xX726aBn29LDbsDtzr_6E._1Ap4F5maDtT1E1YuCiaO0r.D3IL3FD0RFy_mkKLPwL4 > div > div > button"
+            ).is_visible():
+                # This means the post is NSFW and requires to click the proceed button.
 
-        if page.locator(
-            "#t3_12hmbug > div > div._3xX726aBn29LDbsDtzr_6E._1Ap4F5maDtT1E1YuCiaO0r.D3IL3FD0RFy_mkKLPwL4 > div > div > button"
-        ).is_visible():
-            # This means the post is NSFW and requires to click the proceed button.
+                print_substep("Post is NSFW. You are spicy...")
+                page.locator(
+                    "#t3_12hmbug > div > div._3xX726aBn29LDbsDtzr_6E._1Ap4F5maDtT1E1YuCiaO0r.D3IL3FD0RFy_mkKLPwL4 > div > div > button"
+                ).click()
+                page.wait_for_load_state()  # Wait for page to fully load
 
-            print_substep("Post is NSFW. You are spicy...")
-            page.locator(
-                "#t3_12hmbug > div > div._3xX726aBn29LDbsDtzr_6E._1Ap4F5maDtT1E1YuCiaO0r.D3IL3FD0RFy_mkKLPwL4 > div > div > button"
-            ).click()
-            page.wait_for_load_state()  # Wait for page to fully load
-
-            # translate code
-        if page.locator(
-            "#SHORTCUT_FOCUSABLE_DIV > div:nth-child(7) > div > div > div > header > div > div._1m0iFpls1wkPZJVo38-LSh > button > i"
-        ).is_visible():
-            page.locator(
+                # translate code
+            if page.locator(
                 "#SHORTCUT_FOCUSABLE_DIV > div:nth-child(7) > div > div > div > header > div > div._1m0iFpls1wkPZJVo38-LSh > button > i"
-            ).click()  # Interest popup is showing, this code will close it
-
-        if lang:
-            print_substep("Translating post...")
-            texts_in_tl = translators.translate_text(
-                reddit_object["thread_title"],
-                to_language=lang,
-                translator="google",
-            )
-
-            page.evaluate(
-                "tl_content => document.querySelector('[data-adclicklocation=\"title\"] > div > div > h1').textContent = tl_content",
-                texts_in_tl,
-            )
-        else:
-            print_substep("Skipping translation...")
-
-        postcontentpath = f"assets/temp/{reddit_id}/png/title.png"
-        try:
-            if settings.config["settings"]["zoom"] != 1:
-                # store zoom settings
-                zoom = settings.config["settings"]["zoom"]
-                # zoom the body of the page
-                page.evaluate("document.body.style.zoom=" + str(zoom))
-                # as zooming the body doesn't change the properties of the divs, we need to adjust for the zoom
-                location = page.locator('[data-test-id="post-content"]').bounding_box()
-                for i in location:
-                    location[i] = float("{:.2f}".format(location[i] * zoom))
-                page.screenshot(clip=location, path=postcontentpath)
+            ).is_visible():
+                page.locator(
+                    "#SHORTCUT_FOCUSABLE_DIV > div:nth-child(7) > div > div > div > header > div > div._1m0iFpls1wkPZJVo38-LSh > button > i"
+                ).click()  # Interest popup is showing, this code will close it
+
+            if lang:
+                print_substep("Translating post...")
+                texts_in_tl = translate(reddit_object["thread_title"], lang)
+
+                page.evaluate(
+                    "tl_content => document.querySelector('[data-adclicklocation=\"title\"] > div > div > h1').textContent = tl_content",
+                    texts_in_tl,
+                )
             else:
-                page.locator('[data-test-id="post-content"]').screenshot(path=postcontentpath)
-        except Exception as e:
-            print_substep("Something went wrong!", style="red")
-            resp = input(
-                "Something went wrong with making the screenshots! Do you want to skip the post? (y/n) "
-            )
-
-            if resp.casefold().startswith("y"):
-                save_data("", "", "skipped", reddit_id, "")
-                print_substep(
-                    "The post is successfully skipped! You can now restart the program and this post will skipped.",
-                    "green",
+                print_substep("Skipping translation...")
+
+            postcontentpath = f"assets/temp/{reddit_id}/png/title.png"
+            try:
+                if settings.config["settings"]["zoom"] != 1:
+                    # store zoom settings
+                    zoom = settings.config["settings"]["zoom"]
+                    # zoom the body of the page
+                    page.evaluate("document.body.style.zoom=" + str(zoom))
+                    # as zooming the body doesn't change the properties of the divs, we need to adjust for the zoom
+                    location = page.locator('[data-test-id="post-content"]').bounding_box()
+                    for i in location:
+                        location[i] = float("{:.2f}".format(location[i] * zoom))
+                    page.screenshot(clip=location, path=postcontentpath)
+                else:
+                    page.locator('[data-test-id="post-content"]').screenshot(path=postcontentpath)
+            except Exception as e:
+                print_substep("Something went wrong!", style="red")
+                resp = input(
+                    "Something went wrong with making the screenshots! Do you want to skip the post? (y/n) "
                 )
 
-            resp = input("Do you want the error traceback for debugging purposes? (y/n)")
-            if not resp.casefold().startswith("y"):
-                exit()
+                if resp.casefold().startswith("y"):
+                    save_data("", "", "skipped", reddit_id, "")
+                    print_substep(
+                        "The post is successfully skipped! You can now restart the program and this post will skipped.",
+                        "green",
+                    )
 
-            raise e
+                resp = input("Do you want the error traceback for debugging purposes? (y/n)")
+                if not resp.casefold().startswith("y"):
+                    exit()
+
+                raise e
 
         if storymode:
-            page.locator('[data-click-id="text"]').first.screenshot(
-                path=f"assets/temp/{reddit_id}/png/story_content.png"
-            )
+            with metrics.measure(
+                reddit_id,
+                "screenshot:story_content",
+                outputs=[f"assets/temp/{reddit_id}/png/story_content.png"],
+            ):
+                page.locator('[data-click-id="text"]').first.screenshot(
+                    path=f"assets/temp/{reddit_id}/png/story_content.png"
+                )
         else:
+            # usually translated by the TTS already, this only requests what's missing
+            prefetch(
+                comment["comment_body"] for comment in reddit_object["comments"][:screenshot_num]
+            )
             for idx, comment in enumerate(
                 track(
                     reddit_object["comments"][:screenshot_num],
@@ -216,49 +225,52 @@ def get_screenshots_of_reddit_posts(reddit_object: dict, screenshot_num: int):
                 # Stop if we have reached the screenshot_num
                 if idx >= screenshot_num:
                     break
-
-                if page.locator('[data-testid="content-gate"]').is_visible():
-                    page.locator('[data-testid="content-gate"] button').click()
-
-                page.goto(f"https://new.reddit.com/{comment['comment_url']}")
-
-                # translate code
-
-                if settings.config["reddit"]["thread"]["post_lang"]:
-                    comment_tl = translators.translate_text(
-                        comment["comment_body"],
-                        translator="google",
-                        to_language=settings.config["reddit"]["thread"]["post_lang"],
-                    )
-                    page.evaluate(
-                        '([tl_content, tl_id]) => document.querySelector(`#t1_${tl_id} > div:nth-child(2) > div > div[data-testid="comment"] > div`).textContent = tl_content',
-                        [comment_tl, comment["comment_id"]],
-                    )
-                try:
-                    if settings.config["settings"]["zoom"] != 1:
-                        # store zoom settings
-                        zoom = settings.config["settings"]["zoom"]
-                        # zoom the body of the page
-                        page.evaluate("document.body.style.zoom=" + str(zoom))
-                        # scroll comment into view
-                        page.locator(f"#t1_{comment['comment_id']}").scroll_into_view_if_needed()
-                        # as zooming the body doesn't change the properties of the divs, we need to adjust for the zoom
-                        location = page.locator(f"#t1_{comment['comment_id']}").bounding_box()
-                        for i in location:
-                            location[i] = float("{:.2f}".format(location[i] * zoom))
-                        page.screenshot(
-                            clip=location,
-                            path=f"assets/temp/{reddit_id}/png/comment_{idx}.png",
-                        )
-                    else:
-                        page.locator(f"#t1_{comment['comment_id']}").screenshot(
-                            path=f"assets/temp/{reddit_id}/png/comment_{idx}.png"
+                check_stop()
+
+                with metrics.measure(
+                    reddit_id,
+                    f"screenshot:comment_{idx}",
+                    outputs=[f"assets/temp/{reddit_id}/png/comment_{idx}.png"],
+                ):
+                    metrics.count("page_load")
+                    if page.locator('[data-testid="content-gate"]').is_visible():
+                        page.locator('[data-testid="content-gate"] button').click()
+
+                    page.goto(f"https://new.reddit.com/{comment['comment_url']}")
+
+                    # translate code
+
+                    if settings.config["reddit"]["thread"]["post_lang"]:
+                        comment_tl = translate(comment["comment_body"])
+                        page.evaluate(
+                            '([tl_content, tl_id]) => document.querySelector(`#t1_${tl_id} > div:nth-child(2) > div > div[data-testid="comment"] > div`).textContent = tl_content',
+                            [comment_tl, comment["comment_id"]],
                         )
-                except TimeoutError:
-                    del reddit_object["comments"]
-                    screenshot_num += 1
-                    print("TimeoutError: Skipping screenshot...")
-                    continue
+                    try:
+                        if settings.config["settings"]["zoom"] != 1:
+                            # store zoom settings
+                            zoom = settings.config["settings"]["zoom"]
+                            # zoom the body of the page
+                            page.evaluate("document.body.style.zoom=" + str(zoom))
+                            # scroll comment into view
+                            page.locator(f"#t1_{comment['comment_id']}").scroll_into_view_if_needed()
+                            # as zooming the body doesn't change the properties of the divs, we need to adjust for the zoom
+                            location = page.locator(f"#t1_{comment['comment_id']}").bounding_box()
+                            for i in location:
+                                location[i] = float("{:.2f}".format(location[i] * zoom))
+                            page.screenshot(
+                                clip=location,
+                                path=f"assets/temp/{reddit_id}/png/comment_{idx}.png",
+                            )
+                        else:
+                            page.locator(f"#t1_{comment['comment_id']}").screenshot(
+                                path=f"assets/temp/{reddit_id}/png/comment_{idx}.png"
+                            )
+                    except TimeoutError:
+                        del reddit_object["comments"]
+                        screenshot_num += 1
+                        print("TimeoutError: Skipping screenshot...")
+                        continue
 
         # close browser instance when we are done using it
         browser.close()
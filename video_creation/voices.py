@@ -1,29 +1,59 @@
-from typing import Tuple
+import importlib
+from typing import List, Tuple
 
 from rich.console import Console
 
-from TTS.aws_polly import AWSPolly
-from TTS.elevenlabs import elevenlabs
 from TTS.engine_wrapper import TTSEngine
-from TTS.GTTS import GTTS
-from TTS.pyttsx import pyttsx
-from TTS.streamlabs_polly import StreamlabsPolly
-from TTS.TikTok import TikTok
 from utils import settings
-from utils.console import print_step, print_table
+from utils.console import print_step, print_substep, print_table
 
 console = Console()
 
+# "module:class" of every provider, only the chosen one is imported (they pull in boto3, elevenlabs...)
 TTSProviders = {
-    "GoogleTranslate": GTTS,
-    "AWSPolly": AWSPolly,
-    "StreamlabsPolly": StreamlabsPolly,
-    "TikTok": TikTok,
-    "pyttsx": pyttsx,
-    "ElevenLabs": elevenlabs,
+    "GoogleTranslate": "TTS.GTTS:GTTS",
+    "AWSPolly": "TTS.aws_polly:AWSPolly",
+    "StreamlabsPolly": "TTS.streamlabs_polly:StreamlabsPolly",
+    "TikTok": "TTS.TikTok:TikTok",
+    "pyttsx": "TTS.pyttsx:pyttsx",
+    "ElevenLabs": "TTS.elevenlabs:elevenlabs",
+    "Local": "TTS.local:LocalTTS",
 }
 
 
+def load_provider(name: str):
+    """Imports the class of a TTS provider.
+
+    Args:
+        name (str): The name of the provider in TTSProviders, in any case.
+    """
+    module, _, cls = get_case_insensitive_key_value(TTSProviders, name).partition(":")
+    return getattr(importlib.import_module(module), cls)
+
+
+def fallback_providers(voice: str) -> List:
+    """The classes of settings.tts.fallback_voice_choice, in order, without the chosen provider.
+
+    A provider which is unknown or can't be imported (e.g. its package isn't installed) is left out.
+    """
+    names = settings.config["settings"]["tts"].get("fallback_voice_choice", "")
+    providers = []
+    for name in (name.strip() for name in str(names).split(",")):
+        if not name or name.casefold() == str(voice).casefold():
+            continue
+        if get_case_insensitive_key_value(TTSProviders, name) is None:
+            print_substep(f"Unknown fallback TTS provider {name}, skipping it.", style="yellow")
+            continue
+        try:
+            provider = load_provider(name)
+        except ImportError as e:
+            print_substep(f"Can't use {name} as a fallback TTS provider: {e}", style="yellow")
+            continue
+        if provider not in providers:
+            providers.append(provider)
+    return providers
+
+
 def save_text_to_mp3(reddit_obj) -> Tuple[int, int]:
     """Saves text to MP3 files.
 
@@ -35,8 +65,9 @@ def save_text_to_mp3(reddit_obj) -> Tuple[int, int]:
     """
 
     voice = settings.config["settings"]["tts"]["voice_choice"]
+    fallbacks = fallback_providers(voice)
     if str(voice).casefold() in map(lambda _: _.casefold(), TTSProviders):
-        text_to_mp3 = TTSEngine(get_case_insensitive_key_value(TTSProviders, voice), reddit_obj)
+        text_to_mp3 = TTSEngine(load_provider(voice), reddit_obj, fallbacks=fallbacks)
     else:
         while True:
             print_step("Please choose one of the following TTS providers: ")
@@ -45,7 +76,9 @@ def save_text_to_mp3(reddit_obj) -> Tuple[int, int]:
             if choice.casefold() in map(lambda _: _.casefold(), TTSProviders):
                 break
             print("Unknown Choice")
-        text_to_mp3 = TTSEngine(get_case_insensitive_key_value(TTSProviders, choice), reddit_obj)
+        text_to_mp3 = TTSEngine(
+            load_provider(choice), reddit_obj, fallbacks=fallback_providers(choice)
+        )
     return text_to_mp3.run()
 
 